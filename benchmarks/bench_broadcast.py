@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: status broadcast fan-out
+Per-connection send_json-style encoding vs encode-once shared frames
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import json_codec
+
+CONNECTIONS = 10000
+ROUNDS = 20
+
+
+class FakeConnection:
+    """Stands in for ClientConnection: just keeps the last queued frame"""
+
+    __slots__ = ('frame',)
+
+    def __init__(self):
+        self.frame = None
+
+    def send(self, frame):
+        self.frame = frame
+        return True
+
+
+def status_payload() -> dict:
+    return {
+        "type": "status",
+        "connected_users": CONNECTIONS,
+        "pending_otps": 42,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def per_connection(connections, payload) -> int:
+    """Old path: every connection serializes the payload itself"""
+    encoded = 0
+    for conn in connections:
+        frame = json.dumps(payload)
+        encoded += len(frame)
+        conn.send(frame)
+    return encoded
+
+
+def encode_once(connections, payload) -> int:
+    """New path: one shared frame for all recipients"""
+    frame = json_codec.dumps(payload)
+    for conn in connections:
+        conn.send(frame)
+    return len(frame)
+
+
+def bench(label, func, connections):
+    payload = status_payload()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    encoded = 0
+    for _ in range(ROUNDS):
+        encoded += func(connections, payload)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    print(
+        f"  {label:<16} {cpu / ROUNDS * 1000:8.2f} ms CPU/broadcast  "
+        f"{encoded / wall / 1e6:8.2f} MB encoded/s  {encoded / ROUNDS:10.0f} B encoded/broadcast"
+    )
+    return cpu
+
+
+def main():
+    connections = [FakeConnection() for _ in range(CONNECTIONS)]
+    print(f"{CONNECTIONS} connections, {ROUNDS} broadcasts, codec={json_codec.CODEC_NAME}")
+    old = bench("per-connection", per_connection, connections)
+    new = bench("encode-once", encode_once, connections)
+    print(f"  CPU reduction    {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: sender -> service lookup
+Compares the trie-based ServiceRegistry with the old substring scan
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from service_registry import ServiceRegistry
+
+TLDS = ['com', 'co.id', 'id', 'net', 'io', 'org', 'co.uk']
+
+
+def make_services(count: int) -> dict:
+    """Generate `count` synthetic services with 1-3 domains each"""
+    rng = random.Random(42)
+    services = {}
+    for i in range(count):
+        name = ''.join(rng.choices(string.ascii_lowercase, k=8)) + str(i)
+        services[name] = [f"{name}.{rng.choice(TLDS)}" for _ in range(rng.randint(1, 3))]
+    return services
+
+
+def substring_lookup(services: dict, sender: str) -> str:
+    """Old detect_service_domain algorithm"""
+    sender_lower = sender.lower()
+    for service, domains in services.items():
+        for domain in domains:
+            if domain in sender_lower:
+                return service
+    return ''
+
+
+def bench(label: str, func, senders: list) -> float:
+    start = time.perf_counter()
+    for sender in senders:
+        func(sender)
+    elapsed = time.perf_counter() - start
+    per_lookup_us = elapsed / len(senders) * 1e6
+    print(f"  {label:<12} {per_lookup_us:10.2f} µs/lookup")
+    return per_lookup_us
+
+
+def main():
+    rng = random.Random(7)
+    lookups = 20000
+
+    for count in (10, 1000, 5000):
+        services = make_services(count)
+        registry = ServiceRegistry(path=None, services=services)
+
+        all_domains = [d for domains in services.values() for d in domains]
+        senders = []
+        for _ in range(lookups):
+            if rng.random() < 0.5:
+                senders.append(f"noreply@mail.{rng.choice(all_domains)}")
+            else:
+                senders.append(f"user@unknown{rng.randint(0, 10**6)}.example.com")
+
+        # Both algorithms must agree on known senders
+        for sender in senders[:200]:
+            expected = substring_lookup(services, sender)
+            if expected:
+                assert registry.lookup(sender) == expected, sender
+
+        print(f"\n{count} services ({registry.size} domains), {lookups} lookups:")
+        old = bench("substring", lambda s: substring_lookup(services, s), senders)
+        new = bench("trie", registry.lookup, senders)
+        print(f"  speedup      {old / new:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold start cost of main.py and the CLI
+Wall time per scenario plus the `-X importtime` breakdown of the heaviest imports
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SRC = os.path.join(ROOT, 'src')
+RUNS = 5
+TOP_IMPORTS = 8
+
+ALL_MODULES = ['requests', 'telegram', 'fastapi', 'uvicorn', 'aiohttp', 'websockets']
+
+SCENARIOS = [
+    ("python baseline", "pass"),
+    ("main.py import", "import main"),
+    ("old dep check", (
+        "for m in %r:\n"
+        "    try: __import__(m)\n"
+        "    except ImportError: pass" % ALL_MODULES
+    )),
+    ("find_spec check", "import main; main.missing_dependencies()"),
+    ("cli mode", "import main; import tempmail_otp"),
+]
+
+
+def run_once(code: str):
+    """Run `code` in a fresh interpreter, returns (wall seconds, importtime stderr, ok)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, SRC]))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    return time.perf_counter() - start, result.stderr, result.returncode == 0
+
+
+def top_imports(stderr: str, count: int = TOP_IMPORTS):
+    """Top-level imports by cumulative time (µs) from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith('  '):
+            continue  # nested import, already counted by its parent
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    print(f"{sys.executable} ({sys.version.split()[0]}), {RUNS} runs per scenario\n")
+    for label, code in SCENARIOS:
+        walls = []
+        stderr, ok = '', True
+        for _ in range(RUNS):
+            wall, stderr, ok = run_once(code)
+            walls.append(wall)
+        status = '' if ok else '  (failed: missing dependency?)'
+        print(f"{label:<18} median {statistics.median(walls) * 1000:7.1f} ms{status}")
+        for cumulative, name in top_imports(stderr):
+            print(f"    {cumulative / 1000:7.1f} ms  {name}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
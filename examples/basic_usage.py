@@ -3,19 +3,20 @@
 Basic usage example for TempMail OTP
 """
 
+import asyncio
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from tempmail_otp import TempMailGenerator
+from tempmail_otp import ConsoleReporter, ProviderError, TempMailGenerator
 
 def example_basic():
     """Basic example: Generate email and wait for OTP"""
     print("🔵 Basic Example: Generate and Wait for OTP")
     print("-" * 50)
     
-    # Initialize generator
-    gen = TempMailGenerator(provider='auto')
+    # Initialize generator (ConsoleReporter prints progress; default is silent)
+    gen = TempMailGenerator(provider='auto', hooks=ConsoleReporter())
     
     # Generate email
     email = gen.generate_random_email()
@@ -45,7 +46,12 @@ def example_manual_check():
     
     # Manual check
     print("\n📬 Checking inbox manually...")
-    messages = gen.check_inbox()
+    try:
+        messages = gen.check_inbox()
+    except ProviderError as e:
+        # Provider still failing after retries (different from an empty inbox)
+        print(f"❌ Could not check inbox: {e}")
+        return []
     
     if messages:
         print(f"📨 Found {len(messages)} messages:")
@@ -84,6 +90,27 @@ def example_custom_otp():
             print(f"❌ Text: '{text}' -> No OTP found")
 
 
+async def example_async():
+    """Async example: inbox as a context manager, deleted on exit"""
+    print("\n🔵 Async Example")
+    print("-" * 50)
+
+    from tempmail_async import TempMail
+
+    async with TempMail(provider='auto') as box:
+        print(f"✅ Email: {box.email}")
+        print("⏳ Waiting for messages (timeout: 60 seconds)...")
+
+        async for msg in box.messages(timeout=60):
+            print(f"📨 {msg['from']}: {msg['subject']}")
+            if msg['otp']:
+                print(f"🎉 OTP received: {msg['otp']}")
+                return msg['otp']
+
+    print("❌ No OTP received within timeout")
+    return None
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("TEMPMAIL OTP - USAGE EXAMPLES")
@@ -93,6 +120,7 @@ if __name__ == "__main__":
     example_basic()
     example_manual_check()
     example_custom_otp()
+    asyncio.run(example_async())
     
     print("\n" + "=" * 60)
     print("Examples completed!")
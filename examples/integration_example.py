@@ -7,7 +7,8 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from tempmail_otp import TempMailGenerator
+from tempmail_otp import ProviderError, TempMailGenerator
+from batch import run_batch
 import time
 
 class RegistrationAutomation:
@@ -56,11 +57,19 @@ class RegistrationAutomation:
             print("❌ No active email session")
             return []
         
-        messages = self.email_gen.check_inbox()
+        try:
+            messages = self.email_gen.check_inbox()
+        except ProviderError as e:
+            print(f"❌ Could not check inbox: {e}")
+            return []
         detailed = []
         
         for msg in messages:
-            msg_details = self.email_gen.get_message_content(msg.get('id'))
+            try:
+                msg_details = self.email_gen.get_message_content(msg.get('id'))
+            except ProviderError as e:
+                print(f"⚠️ Skipping message {msg.get('id')}: {e}")
+                continue
             if msg_details:
                 detailed.append(msg_details)
         
@@ -68,29 +77,28 @@ class RegistrationAutomation:
 
 
 class BatchRegistration:
-    """Example: Register multiple accounts"""
+    """Example: Register multiple accounts concurrently"""
     
     def __init__(self):
         self.accounts = []
     
-    def register_batch(self, count=3):
-        """Register multiple accounts"""
+    def register_batch(self, count=3, concurrency=5):
+        """Register multiple accounts, all inboxes watched at the same time"""
         print(f"\n🔄 Batch Registration: {count} accounts")
         print("=" * 50)
         
-        for i in range(count):
-            print(f"\n📌 Account {i+1}/{count}")
-            print("-" * 30)
-            
-            automation = RegistrationAutomation()
-            success = automation.register_account(f"Site-{i+1}")
-            
-            if success:
+        # Results arrive as each inbox gets its OTP (or times out)
+        for result in run_batch(count, concurrency=concurrency, timeout=120, check_interval=3):
+            site = f"Site-{result['index'] + 1}"
+            if result['status'] == 'otp':
+                print(f"✅ {site}: {result['email']} → OTP {result['otp']} ({result['latency']:.1f}s)")
                 self.accounts.append({
-                    'email': automation.current_email,
-                    'site': f"Site-{i+1}",
+                    'email': result['email'],
+                    'site': site,
                     'status': 'active'
                 })
+            else:
+                print(f"❌ {site}: {result['status']}")
         
         # Summary
         print("\n" + "=" * 50)
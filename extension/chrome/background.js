@@ -7,6 +7,8 @@ let reconnectTimer = null;
 let isConnected = false;
 let lastOTP = null;
 let currentEmail = null;
+let lastOTPSeq = 0;
+let lastSeq = 0;  // Last event seq seen, used to resume after reconnect
 
 // Initialize on install
 chrome.runtime.onInstalled.addListener(() => {
@@ -18,6 +20,10 @@ chrome.runtime.onInstalled.addListener(() => {
 async function loadUserConfig() {
   const result = await chrome.storage.sync.get(['userId', 'autoConnect']);
   
+  const local = await chrome.storage.local.get(['lastOTPSeq', 'lastSeq']);
+  lastOTPSeq = local.lastOTPSeq || 0;
+  lastSeq = local.lastSeq || 0;
+  
   if (result.userId) {
     userId = result.userId;
     if (result.autoConnect !== false) {
@@ -39,7 +45,8 @@ function connectWebSocket() {
   }
   
   console.log(`🔌 Connecting to WebSocket as ${userId}...`);
-  socket = new WebSocket(`ws://172.17.2.13:8000/ws/${userId}`);
+  const resume = lastSeq ? `?since=${lastSeq}` : '';
+  socket = new WebSocket(`ws://172.17.2.13:8000/ws/${userId}${resume}`);
   
   socket.onopen = () => {
     console.log('✅ WebSocket connected');
@@ -64,8 +71,20 @@ function connectWebSocket() {
     const data = JSON.parse(event.data);
     console.log('📨 Received:', data);
     
+    if (data.seq && data.seq > lastSeq) {
+      lastSeq = data.seq;
+      chrome.storage.local.set({ lastSeq: data.seq });
+    }
+    
     switch(data.type) {
       case 'otp':
+        // Ack so the server stops retransmitting; skip OTPs already handled
+        if (data.seq) {
+          socket.send(JSON.stringify({ type: 'ack', seq: data.seq }));
+          if (data.seq <= lastOTPSeq) break;
+          lastOTPSeq = data.seq;
+          await chrome.storage.local.set({ lastOTPSeq: data.seq });
+        }
         await handleOTP(data);
         break;
         
@@ -93,6 +112,11 @@ function connectWebSocket() {
         currentEmail = data.email;
         break;
         
+      case 'resync':
+        // Some missed events were no longer available; refresh state
+        socket.send(JSON.stringify({ type: 'status' }));
+        break;
+        
       case 'ping':
         socket.send(JSON.stringify({ type: 'pong' }));
         break;
@@ -118,12 +142,12 @@ function connectWebSocket() {
       connected: false
     }).catch(() => {});
     
-    // Auto reconnect after 5 seconds
+    // Auto reconnect after 5-10 seconds (jitter spreads out reconnect storms)
     clearTimeout(reconnectTimer);
     reconnectTimer = setTimeout(() => {
       console.log('🔄 Attempting to reconnect...');
       connectWebSocket();
-    }, 5000);
+    }, 5000 + Math.random() * 5000);
   };
 }
 
@@ -5,41 +5,33 @@ All-in-One TempMail OTP Bot - Single file to run everything
 
 import sys
 import os
-import threading
 import time
 import signal
-import subprocess
-from typing import Optional
+from importlib.util import find_spec
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-# Global flags
-services = {
-    'bot': None,
-    'server': None,
-    'cli': None
+# Modules each mode needs; heavy ones are only imported when that mode starts
+DEPENDENCIES = {
+    'cli': ['requests'],
+    'bot': ['requests', 'telegram', 'aiohttp'],
+    'server': ['fastapi', 'uvicorn', 'websockets'],
 }
 
-def run_telegram_bot():
-    """Run Telegram bot in thread"""
-    try:
-        from src.telegram_bot import main
-        print("🤖 Starting Telegram Bot...")
-        print("-" * 50)
-        main()
-    except Exception as e:
-        print(f"❌ Bot error: {e}")
-
-def run_autofill_server():
-    """Run WebSocket server in thread"""
-    try:
-        from src.websocket_server import main
-        print("🌐 Starting Auto-Fill Server...")
-        print("-" * 50)
-        main()
-    except Exception as e:
-        print(f"❌ Server error: {e}")
+def run_services(names):
+    """Run services under the supervisor until Ctrl+C / SIGTERM
+    
+    SUPERVISOR_MODE=loop (default) runs everything on one event loop,
+    SUPERVISOR_MODE=processes runs each service in its own process.
+    """
+    import logging
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    from supervisor import run_services as supervise
+    supervise(names)
 
 def run_cli_mode():
     """Run CLI mode"""
@@ -51,22 +43,58 @@ def run_cli_mode():
     except Exception as e:
         print(f"❌ CLI error: {e}")
 
-def check_dependencies():
-    """Check if all dependencies are installed"""
-    required = ['requests', 'telegram', 'fastapi', 'uvicorn', 'aiohttp', 'websockets']
-    missing = []
+def run_batch_mode(argv):
+    """Headless batch: create N inboxes, watch them concurrently, print JSONL results"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='python main.py batch')
+    parser.add_argument('--count', type=int, required=True, help='number of inboxes')
+    parser.add_argument('--concurrency', type=int, default=10, help='parallel provider requests')
+    parser.add_argument('--provider', default='auto', choices=['auto', 'mailtm', 'guerrilla'])
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait per inbox')
+    parser.add_argument('--interval', type=float, default=5, help='seconds between inbox checks')
+    parser.add_argument('--output', help='JSONL file (default: stdout)')
+    args = parser.parse_args(argv)
     
-    for module in required:
-        try:
-            __import__(module)
-        except ImportError:
-            missing.append(module)
+    from batch import run_batch, write_jsonl
+    
+    # JSONL goes to stdout (or --output); progress prints go to stderr
+    output = open(args.output, 'w') if args.output else sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        counts = write_jsonl(run_batch(
+            args.count,
+            concurrency=args.concurrency,
+            provider=args.provider,
+            timeout=args.timeout,
+            check_interval=args.interval
+        ), output)
+    finally:
+        if args.output:
+            output.close()
+    
+    summary = ', '.join(f"{status}: {n}" for status, n in sorted(counts.items()))
+    print(f"📊 Batch selesai ({summary})")
+
+def missing_dependencies(*modes):
+    """Modules required by the given modes (default: all) that are not installed
+    
+    Uses find_spec, so nothing is actually imported.
+    """
+    required = []
+    for mode in modes or DEPENDENCIES:
+        required += [module for module in DEPENDENCIES[mode] if module not in required]
+    return [module for module in required if find_spec(module) is None]
+
+def check_dependencies(*modes):
+    """Check if the dependencies of the given modes (default: all) are installed"""
+    missing = missing_dependencies(*modes)
     
     if missing:
         print("⚠️ Missing dependencies detected!")
         print(f"Missing: {', '.join(missing)}")
         print("\n📦 Installing dependencies...")
         
+        import subprocess
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
             print("✅ Dependencies installed!")
@@ -126,16 +154,6 @@ def show_menu():
     print("7. ❌ Exit")
     print("\n" + "-" * 60)
 
-def start_service(service_type, target_func):
-    """Start a service in thread"""
-    if services[service_type] and services[service_type].is_alive():
-        print(f"⚠️ {service_type} already running")
-        return
-    
-    services[service_type] = threading.Thread(target=target_func, daemon=True)
-    services[service_type].start()
-    time.sleep(2)  # Give time to start
-
 def open_dashboard():
     """Open dashboard in browser"""
     import webbrowser
@@ -143,67 +161,54 @@ def open_dashboard():
     print(f"🌐 Opening dashboard: {url}")
     webbrowser.open(url)
 
+def webhook_via_server() -> bool:
+    """In webhook mode the server hosts the bot endpoint (no separate bot service)"""
+    return os.getenv('TELEGRAM_BOT_MODE', 'polling').lower() == 'webhook'
+
 def run_all_services():
     """Run bot and server together"""
     print("\n🚀 Starting all services...")
     print("=" * 60)
     
-    # Start bot
-    start_service('bot', run_telegram_bot)
-    
-    # Start server
-    start_service('server', run_autofill_server)
+    names = ['server'] if webhook_via_server() else ['bot', 'server']
     
-    print("\n✅ All services started!")
-    print("\nServices running:")
-    print("  • Telegram Bot: Active")
+    print("\nServices:")
+    print("  • Telegram Bot: " + ("Active" if 'bot' in names else "Webhook (via server)"))
     print("  • Auto-Fill Server: http://localhost:8000")
     print("  • Dashboard: http://localhost:8000/dashboard")
+    print("  • Health: http://localhost:8000/api/services")
     print("\nPress Ctrl+C to stop all services")
     
-    # Keep running
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\n\n🛑 Stopping all services...")
-        sys.exit(0)
+    run_services(names)
+    sys.exit(0)
 
 def run_bot_only():
     """Run only Telegram bot"""
     print("\n🤖 Running Telegram Bot only...")
     print("=" * 60)
     
-    start_service('bot', run_telegram_bot)
-    
-    print("\n✅ Bot started!")
     print("Press Ctrl+C to stop")
     
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\n🛑 Bot stopped")
-        sys.exit(0)
+    # Replit needs an HTTP listener for uptime pings: the server's /health/live
+    # (in webhook mode the server already runs the bot)
+    if os.getenv('REPL_ID'):
+        names = ['server'] if webhook_via_server() else ['bot', 'server']
+    else:
+        names = ['bot']
+    run_services(names)
+    sys.exit(0)
 
 def run_server_only():
     """Run only WebSocket server"""
     print("\n🌐 Running Auto-Fill Server only...")
     print("=" * 60)
     
-    start_service('server', run_autofill_server)
-    
-    print("\n✅ Server started!")
     print("  • Server: http://localhost:8000")
     print("  • Dashboard: http://localhost:8000/dashboard")
     print("\nPress Ctrl+C to stop")
     
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\n🛑 Server stopped")
-        sys.exit(0)
+    run_services(['server'])
+    sys.exit(0)
 
 def setup_install():
     """Run setup/installation"""
@@ -304,28 +309,16 @@ def main():
             input("\nPress Enter to continue...")
 
 def graceful_shutdown(signum, frame):
-    """Graceful shutdown handler"""
-    print("\n\n🛑 Shutting down gracefully...")
-    
-    # Stop all services
-    for service_name, service_thread in services.items():
-        if service_thread and service_thread.is_alive():
-            print(f"   Stopping {service_name}...")
+    """Shutdown handler outside of the supervisor (menu, CLI, setup)
     
-    print("✅ Cleanup complete. Goodbye!")
+    While services run, the supervisor installs its own handlers that
+    drain and stop them before returning here.
+    """
+    print("\n\n🛑 Shutting down...")
+    print("👋 Goodbye!")
     sys.exit(0)
 
 if __name__ == "__main__":
-    # Check if running on Replit
-    if os.getenv('REPL_ID'):
-        try:
-            sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'deploy'))
-            from keep_alive import keep_alive
-            keep_alive()
-            print("✅ Keep-alive server started for Replit")
-        except:
-            pass
-    
     # Handle Ctrl+C gracefully
     signal.signal(signal.SIGINT, graceful_shutdown)
     signal.signal(signal.SIGTERM, graceful_shutdown)
@@ -335,6 +328,8 @@ if __name__ == "__main__":
         arg = sys.argv[1].lower()
         
         if arg in ['all', 'start']:
+            if not check_dependencies('bot', 'server'):
+                sys.exit(1)
             if check_config():
                 run_all_services()
             else:
@@ -342,6 +337,8 @@ if __name__ == "__main__":
                 sys.exit(1)
                 
         elif arg in ['bot', 'telegram']:
+            if not check_dependencies('bot'):
+                sys.exit(1)
             if check_config():
                 run_bot_only()
             else:
@@ -349,11 +346,20 @@ if __name__ == "__main__":
                 sys.exit(1)
                 
         elif arg in ['server', 'autofill']:
+            if not check_dependencies('server'):
+                sys.exit(1)
             run_server_only()
             
         elif arg in ['cli', 'terminal']:
+            if not check_dependencies('cli'):
+                sys.exit(1)
             run_cli_mode()
             
+        elif arg == 'batch':
+            if not check_dependencies('cli'):
+                sys.exit(1)
+            run_batch_mode(sys.argv[2:])
+            
         elif arg in ['setup', 'install']:
             setup_install()
             
@@ -365,6 +371,7 @@ if __name__ == "__main__":
             print("  python main.py bot      # Run bot only")
             print("  python main.py server   # Run server only")
             print("  python main.py cli      # Run CLI mode")
+            print("  python main.py batch --count N --concurrency C  # JSONL batch")
             print("  python main.py setup    # Run setup")
             sys.exit(1)
     else:
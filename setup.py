@@ -16,8 +16,8 @@ from __version__ import __version__, __description__
 
 def check_python_version():
     """Check Python version"""
-    if sys.version_info < (3, 7):
-        print("❌ Python 3.7+ required")
+    if sys.version_info < (3, 9):
+        print("❌ Python 3.9+ required")
         return False
     print(f"✅ Python {sys.version.split()[0]} detected")
     return True
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+Per-user / per-IP token buckets, global connection cap and memory load shedding
+"""
+
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+from rate_limit import TokenBucket
+
+# Defaults
+MAX_TRACKED_KEYS = 100000  # buckets kept per limiter (least recently used evicted)
+MEMORY_SAMPLE_INTERVAL = 1.0  # seconds between RSS reads
+
+
+def memory_usage_mb() -> Optional[float]:
+    """Resident set size of this process in MB (None when unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class KeyedLimiter:
+    """One token bucket per key (user_id or IP), LRU-bounded"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = MAX_TRACKED_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: str, tokens: float = 1.0) -> Tuple[bool, float]:
+        """Consume tokens for `key`, returns (allowed, seconds until retry)"""
+        tokens = min(tokens, self.burst)  # a full bucket always admits one request
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        if bucket.try_consume(tokens):
+            return True, 0.0
+        return False, bucket.wait_time(tokens)
+
+    def prune(self) -> int:
+        """Forget buckets that refilled completely (idle keys)"""
+        now = time.monotonic()
+        idle = [key for key, bucket in self._buckets.items() if bucket.is_full(now)]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+
+class AdmissionController:
+    """Decides whether a request or connection is admitted
+
+    Checks return None when admitted, otherwise (reason, retry_after).
+    Rejections are counted per reason for the metrics endpoints.
+    """
+
+    def __init__(self, user_rate: float, user_burst: float, ip_rate: float, ip_burst: float,
+                 max_connections: int = 0, memory_limit_mb: float = 0):
+        self.users = KeyedLimiter(user_rate, user_burst)
+        self.ips = KeyedLimiter(ip_rate, ip_burst)
+        self.max_connections = max_connections  # 0 = unlimited
+        self.memory_limit_mb = memory_limit_mb  # 0 = no load shedding
+        self.rejections: Counter = Counter()
+        self.draining = False  # set during shutdown: refuse everything new
+        self._memory_mb: Optional[float] = None
+        self._memory_checked = 0.0
+
+    def _reject(self, reason: str, retry_after: float = 1.0) -> Tuple[str, float]:
+        self.rejections[reason] += 1
+        return reason, retry_after
+
+    def overloaded(self) -> bool:
+        """True while RSS is above the memory limit (sampled at most once per second)"""
+        if not self.memory_limit_mb:
+            return False
+        now = time.monotonic()
+        if now - self._memory_checked >= MEMORY_SAMPLE_INTERVAL:
+            self._memory_checked = now
+            self._memory_mb = memory_usage_mb()
+        return self._memory_mb is not None and self._memory_mb > self.memory_limit_mb
+
+    def check_request(self, ip: str, tokens: float = 1.0) -> Optional[Tuple[str, float]]:
+        """Admission for one API call from `ip` (`tokens` = items it carries)"""
+        if self.draining:
+            return self._reject('draining')
+        if self.overloaded():
+            return self._reject('memory')
+
+        allowed, retry_after = self.ips.allow(ip, tokens)
+        if not allowed:
+            return self._reject('ip_rate', retry_after)
+        return None
+
+    def check_user(self, user_id: str) -> Optional[Tuple[str, float]]:
+        """Admission for one event or connection of `user_id`"""
+        allowed, retry_after = self.users.allow(user_id)
+        if not allowed:
+            return self._reject('user_rate', retry_after)
+        return None
+
+    def check_connection(self, ip: str, user_id: str, open_connections: int) -> Optional[Tuple[str, float]]:
+        """Admission for a new long-lived connection (WebSocket / SSE)"""
+        if self.draining:
+            return self._reject('draining')
+        if self.max_connections and open_connections >= self.max_connections:
+            return self._reject('connection_cap')
+        return self.check_request(ip) or self.check_user(user_id)
+
+    def prune(self) -> int:
+        return self.users.prune() + self.ips.prune()
+
+    def stats(self) -> Dict:
+        return {
+            'rejections': dict(self.rejections),
+            'tracked_users': len(self.users),
+            'tracked_ips': len(self.ips),
+            'memory_mb': round(self._memory_mb, 1) if self._memory_mb is not None else None,
+            'memory_limit_mb': self.memory_limit_mb or None,
+            'max_connections': self.max_connections or None
+        }
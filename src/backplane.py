@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Connection Manager Backplane
+Propagates per-user state changes between server worker processes
+"""
+
+import asyncio
+import fcntl
+import glob
+import itertools
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BACKPLANE = os.getenv('BACKPLANE', 'memory')  # 'memory' or 'unix'
+BACKPLANE_DIR = os.getenv('BACKPLANE_DIR', '/tmp/tempmail-backplane')
+PEER_REFRESH_INTERVAL = 1.0  # seconds between peer socket discovery
+REPLY_TIMEOUT = 2.0  # seconds a worker gets to answer; no answer counts as not delivered
+
+Handler = Callable[[Dict], Awaitable[object]]
+Sequencer = Callable[[Dict], None]
+
+_request_ids = itertools.count(1)
+
+
+class Backplane:
+    """Delivers cluster-wide operations to every worker's handler
+
+    `publish` stamps the message with the sequencer (e.g. assigns the event
+    seq), applies it on every worker and returns the stamped message and
+    whether any worker's handler reported a delivery. `forward` sends an
+    operation already applied here to the other workers. `gather` asks every
+    other worker's handler and returns their answers.
+    """
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+        self.sequencer: Optional[Sequencer] = None
+
+    async def start(self, handler: Handler, sequencer: Optional[Sequencer] = None) -> None:
+        self.handler = handler
+        self.sequencer = sequencer
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, message: Dict) -> Tuple[Dict, bool]:
+        if self.sequencer:
+            self.sequencer(message)
+        return message, bool(await self.handler(message))
+
+    async def forward(self, message: Dict) -> None:
+        pass
+
+    async def gather(self, message: Dict) -> List:
+        return []
+
+
+class InProcessBackplane(Backplane):
+    """Single worker: messages only need local delivery"""
+
+
+class _Peer:
+    """Connection to another worker; its replies are matched to our requests by id"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.waiting: Dict[int, asyncio.Future] = {}
+        self.task = asyncio.create_task(self._read_replies(reader))
+
+    @property
+    def closed(self) -> bool:
+        return self.writer.is_closing()
+
+    async def _read_replies(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frame = json_codec.loads(line)
+                future = self.waiting.pop(frame["reply"], None)
+                if future is not None and not future.done():
+                    future.set_result(frame.get("result"))
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            self.close()
+
+    def request(self, frame: Dict) -> asyncio.Future:
+        """Write one request now (keeps call order), the future resolves with the reply"""
+        request_id = next(_request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write(json_codec.dumps(dict(frame, id=request_id)).encode('utf-8') + b"\n")
+        return future
+
+    def close(self) -> None:
+        self.writer.close()
+        # Cancelled, not failed: nobody has to retrieve the error of a dropped request
+        for future in self.waiting.values():
+            future.cancel()
+        self.waiting.clear()
+
+
+class UnixSocketBackplane(Backplane):
+    """Workers on one host, each listening on a Unix socket in a shared directory
+
+    Messages are newline-delimited JSON over persistent peer connections.
+    One worker, the holder of an flock on `leader.lock`, is the sequencer:
+    every published or forwarded message goes through it, it stamps seqs and
+    sends messages to all workers in one order over its own connections, so
+    every worker applies events and acks in seq order. When the sequencer
+    dies the kernel releases the lock and the next worker to try takes over.
+    Sockets of dead workers are removed when a connection is refused.
+    """
+
+    def __init__(self, directory: str = BACKPLANE_DIR):
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, f"worker-{os.getpid()}.sock")
+        self.lock_path = os.path.join(directory, 'leader.lock')
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Dict[str, _Peer] = {}
+        self._peer_paths = []
+        self._next_refresh = 0.0
+        self._lock_fd: Optional[int] = None
+        self._order: Optional[asyncio.Lock] = None
+        self._tasks = set()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None
+
+    async def start(self, handler: Handler, sequencer: Optional[Sequencer] = None) -> None:
+        await super().start(handler, sequencer)
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._order = asyncio.Lock()
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        self._elect()
+        logger.info(f"🔗 Backplane listening on {self.path}")
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        for peer in self._peers.values():
+            peer.task.cancel()
+            peer.close()
+        self._peers.clear()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # Releases the flock for the next sequencer
+            self._lock_fd = None
+
+    def _elect(self) -> None:
+        """Become the sequencer if no live worker holds the leader lock"""
+        if self._lock_fd is not None:
+            return
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, self.path.encode('utf-8'), 0)
+        self._lock_fd = fd
+        logger.info(f"👑 Backplane sequencer: {self.path}")
+
+    async def _leader(self) -> Optional[_Peer]:
+        """Connection to the sequencer, None if this worker is (or just became) it"""
+        self._elect()
+        if self.is_leader:
+            return None
+        try:
+            with open(self.lock_path) as f:
+                path = f.read().strip()
+        except OSError:
+            path = ''
+        peer = await self._peer(path) if path else None
+        if peer is None:
+            raise ConnectionError("Backplane sequencer unreachable")
+        return peer
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frame = json_codec.loads(line)
+                if "sequence" in frame:
+                    # Another worker's publish/forward: order it without blocking this connection
+                    self._spawn(self._sequence_request(writer, frame))
+                    continue
+                # Applied inline: messages from the sequencer keep their order
+                try:
+                    result = await self.handler(frame["message"])
+                except Exception as e:
+                    logger.error(f"Backplane message failed: {e}")
+                    result = None
+                self._reply(writer, frame["id"], result)
+        except (asyncio.CancelledError, ConnectionError):
+            pass  # Server shutting down or peer gone
+        finally:
+            writer.close()
+
+    def _reply(self, writer: asyncio.StreamWriter, request_id: int, result) -> None:
+        if not writer.is_closing():
+            writer.write(json_codec.dumps({"reply": request_id, "result": result}).encode('utf-8') + b"\n")
+
+    def _discover(self) -> None:
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        self._next_refresh = now + PEER_REFRESH_INTERVAL
+        pattern = os.path.join(self.directory, 'worker-*.sock')
+        self._peer_paths = [path for path in glob.glob(pattern) if path != self.path]
+
+    async def _peer(self, path: str) -> Optional[_Peer]:
+        peer = self._peers.get(path)
+        if peer is not None and not peer.closed:
+            return peer
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Stale socket of a dead worker
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        current = self._peers.get(path)
+        if current is not None and not current.closed:
+            # Another task connected meanwhile: keep one connection per peer (one order)
+            writer.close()
+            return current
+        peer = self._peers[path] = _Peer(reader, writer)
+        return peer
+
+    async def _connected_peers(self) -> List[Tuple[str, _Peer]]:
+        self._discover()
+        peers = []
+        for path in self._peer_paths:
+            peer = await self._peer(path)
+            if peer is not None:
+                peers.append((path, peer))
+        return peers
+
+    async def _collect(self, replies: List[asyncio.Future]) -> List:
+        """Answers that arrive within REPLY_TIMEOUT (dead or slow workers are left out)"""
+        if not replies:
+            return []
+        done, pending = await asyncio.wait(replies, timeout=REPLY_TIMEOUT)
+        for future in pending:
+            future.cancel()
+        return [future.result() for future in done if not future.cancelled()]
+
+    async def _sequence(
+        self, message: Dict, origin: Optional[str], stamp: bool
+    ) -> Tuple[Dict, bool, List[asyncio.Future]]:
+        """Sequencer: stamp and send the message to every worker except `origin`
+
+        The lock makes stamping and writing one step, so seqs reach every
+        worker in increasing order. Returns the message, the local result and
+        the other workers' pending replies.
+        """
+        async with self._order:
+            if stamp and self.sequencer:
+                self.sequencer(message)
+            local = False
+            if origin != self.path:
+                local = bool(await self.handler(message))
+            replies = [
+                peer.request({"message": message})
+                for path, peer in await self._connected_peers()
+                if path != origin
+            ]
+        return message, local, replies
+
+    async def _sequence_request(self, writer: asyncio.StreamWriter, frame: Dict) -> None:
+        """Sequencer: order a message from another worker, reply with its delivery"""
+        message, local, replies = await self._sequence(frame["sequence"], frame.get("origin"), frame["stamp"])
+        delivered = local or any(await self._collect(replies))
+        self._reply(writer, frame["id"], {"message": message, "delivered": delivered})
+
+    async def _route(self, message: Dict, origin: Optional[str], stamp: bool) -> Optional[asyncio.Future]:
+        """Send to the sequencer; sequence here when this worker is (or must act as) it"""
+        try:
+            leader = await self._leader()
+        except ConnectionError as e:
+            logger.warning(f"{e}, sequencing locally")
+            leader = None
+        if leader is None:
+            message, local, replies = await self._sequence(message, origin, stamp)
+            future = asyncio.get_running_loop().create_future()
+            future.set_result({"message": message, "delivered": local or any(await self._collect(replies))})
+            return future
+        return leader.request({"sequence": message, "origin": origin, "stamp": stamp})
+
+    async def publish(self, message: Dict) -> Tuple[Dict, bool]:
+        # No origin: this worker applies it too, in sequencer order
+        reply = await self._route(message, None, stamp=True)
+        # The sequencer itself waits up to REPLY_TIMEOUT for the other workers
+        await asyncio.wait([reply], timeout=2 * REPLY_TIMEOUT)
+        if not reply.done() or reply.cancelled():
+            reply.cancel()
+            raise ConnectionError("Backplane sequencer did not answer")
+        result = reply.result()
+        return result["message"], result["delivered"]
+
+    async def forward(self, message: Dict) -> None:
+        await self._route(message, self.path, stamp=False)
+
+    async def gather(self, message: Dict) -> List:
+        peers = await self._connected_peers()
+        return await self._collect([peer.request({"message": message}) for _, peer in peers])
+
+
+def create_backplane(kind: str = BACKPLANE) -> Backplane:
+    """Backplane selected by BACKPLANE env ('memory' or 'unix')"""
+    if kind == 'unix':
+        return UnixSocketBackplane()
+    return InProcessBackplane()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Batch Inbox Watcher
+Create N temp inboxes in parallel and watch them all from one scheduler
+"""
+
+import json
+import sys
+import time
+from typing import Dict, Iterator, Optional, TextIO
+
+from poll_scheduler import PollScheduler
+from retry import Deadline
+from tempmail_otp import TempMailGenerator
+
+# Defaults
+DEFAULT_CONCURRENCY = 10
+DEFAULT_TIMEOUT = 120  # seconds per inbox, counted from its creation
+DEFAULT_CHECK_INTERVAL = 5  # seconds between polls of one inbox
+
+PROVIDER_NAMES = {
+    'MailTmGenerator': 'mailtm',
+    'GuerrillaMailGenerator': 'guerrilla',
+}
+
+
+class _Inbox:
+    """Scheduler state of one inbox"""
+
+    __slots__ = ('index', 'generator', 'created_at', 'create_time', 'checked', 'deadline')
+
+    def __init__(self, index: int, generator: TempMailGenerator, created_at: float,
+                 create_time: float, timeout: float):
+        self.index = index
+        self.generator = generator
+        self.created_at = created_at
+        self.create_time = create_time
+        self.checked = set()
+        self.deadline = Deadline(timeout)  # Request timeouts shrink as the inbox nears its timeout
+
+    def result(self, status: str, otp: Optional[str] = None) -> Dict:
+        return {
+            'index': self.index,
+            'status': status,
+            'email': self.generator.email,
+            'provider': PROVIDER_NAMES.get(type(self.generator.generator).__name__, 'unknown'),
+            'otp': otp,
+            'latency': round(time.monotonic() - self.created_at, 3),
+            'create_time': round(self.create_time, 3),
+        }
+
+
+def _create(index: int, provider: str, timeout: float) -> _Inbox:
+    start = time.monotonic()
+    generator = TempMailGenerator(provider=provider)
+    generator.generate_random_email()
+    now = time.monotonic()
+    return _Inbox(index, generator, now, now - start, timeout)
+
+
+def _poll(inbox: _Inbox, otp_length: int) -> Optional[str]:
+    return inbox.generator.poll_otp(inbox.checked, otp_length, inbox.deadline)
+
+
+def run_batch(
+    count: int,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    provider: str = 'auto',
+    timeout: float = DEFAULT_TIMEOUT,
+    check_interval: float = DEFAULT_CHECK_INTERVAL,
+    otp_length: int = 6
+) -> Iterator[Dict]:
+    """Create `count` inboxes and yield one result per inbox as soon as it finishes
+
+    At most `concurrency` provider requests run at once. Each inbox is
+    polled every `check_interval` seconds by a single scheduler until an
+    OTP arrives or `timeout` expires. Results have `status` 'otp',
+    'timeout' or 'error', the email, provider, OTP and `latency`
+    (seconds from inbox creation to the result).
+    """
+    with PollScheduler(concurrency, thread_name_prefix='batch') as scheduler:
+        for index in range(count):
+            scheduler.schedule(('create', index), _create, index, provider, timeout)
+
+        for (kind, item), future in scheduler.completed():
+            error = future.exception()
+
+            if kind == 'create':
+                if error is not None:
+                    yield {'index': item, 'status': 'error', 'error': str(error)}
+                else:
+                    inbox = future.result()
+                    scheduler.schedule(('poll', inbox), _poll, inbox, otp_length)
+                continue
+
+            inbox = item
+            otp = None if error is not None else future.result()
+            if otp:
+                yield inbox.result('otp', otp)
+            elif time.monotonic() - inbox.created_at >= timeout:
+                yield inbox.result('timeout')
+            else:
+                # Poll errors are retried until the inbox times out
+                scheduler.schedule(('poll', inbox), _poll, inbox, otp_length, at=time.monotonic() + check_interval)
+
+
+def write_jsonl(results: Iterator[Dict], output: TextIO = sys.stdout) -> Dict[str, int]:
+    """Stream results as JSON lines, returns counts per status"""
+    counts: Dict[str, int] = {}
+    for result in results:
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return counts
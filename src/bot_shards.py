@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Sharded Bot Mode
+Front process receives updates and routes them by user_id to worker processes
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import Application, ApplicationHandlerStop, ContextTypes, TypeHandler
+
+logger = logging.getLogger(__name__)
+
+SUPERVISE_INTERVAL = 2  # seconds between worker liveness checks
+RESTART_BACKOFF = 5  # seconds before a dead worker is respawned
+WORKER_CONCURRENCY = 32  # updates processed in parallel per worker
+
+
+def shard_weight(shard_id: int, user_id: int) -> int:
+    """Rendezvous hash weight of a user on a shard"""
+    digest = hashlib.blake2b(f"{shard_id}:{user_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def pick_shard(user_id: int, live_shards: List[int]) -> Optional[int]:
+    """Highest random weight: only users of a dead shard move when it leaves"""
+    if not live_shards:
+        return None
+    return max(live_shards, key=lambda shard_id: shard_weight(shard_id, user_id))
+
+
+def update_user_id(update: Update) -> int:
+    """Routing key for an update (user, falling back to chat)"""
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return 0
+
+
+def run_worker(shard_id: int, shard_count: int, bot_token: str, conn) -> None:
+    """Worker process entry point: owns the sessions and monitors of one shard"""
+    logging.basicConfig(
+        format=f'%(asctime)s - shard{shard_id} - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    import telegram_bot
+
+    telegram_bot.outbound.set_global_rate(telegram_bot.BotConfig.SEND_RATE_GLOBAL / shard_count)
+
+    async def serve():
+        application = (
+            Application.builder()
+            .token(bot_token)
+            .updater(None)
+            .concurrent_updates(WORKER_CONCURRENCY)
+            .build()
+        )
+        telegram_bot.register_handlers(application)
+
+        await application.initialize()
+        await telegram_bot.post_init(application)
+        await application.start()
+        logger.info(f"✅ Shard {shard_id} ready")
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    data = await loop.run_in_executor(None, conn.recv)
+                except EOFError:
+                    break
+                await application.update_queue.put(Update.de_json(data, application.bot))
+        finally:
+            # Send queued replies while the bot can still make requests
+            await telegram_bot.post_stop(application)
+            await application.stop()
+            await application.shutdown()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardRouter:
+    """Spawns worker processes and forwards updates to the owning shard
+
+    Users of a dead shard move to another one and stay there after the
+    shard is respawned: the interim shard holds their new sessions and
+    monitor tasks, the respawned one starts empty.
+    """
+
+    def __init__(self, bot_token: str, shard_count: int):
+        self.bot_token = bot_token
+        self.shard_count = shard_count
+        self.ctx = multiprocessing.get_context('spawn')
+        self.workers: Dict[int, multiprocessing.Process] = {}
+        self.pipes: Dict[int, object] = {}
+        self.dead_since: Dict[int, float] = {}
+        self.assigned: Dict[int, int] = {}  # user_id -> shard that took them over
+        # One sender thread per shard: a full pipe blocks that shard's updates, never the loop
+        self.senders = {
+            shard_id: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard{shard_id}-send")
+            for shard_id in range(shard_count)
+        }
+
+    @property
+    def live_shards(self) -> List[int]:
+        return [shard_id for shard_id in self.workers if shard_id not in self.dead_since]
+
+    def spawn(self, shard_id: int) -> None:
+        """Start (or restart) the worker for a shard"""
+        old_conn = self.pipes.pop(shard_id, None)
+        if old_conn is not None:
+            old_conn.close()
+
+        recv_conn, send_conn = self.ctx.Pipe(duplex=False)
+        process = self.ctx.Process(
+            target=run_worker,
+            args=(shard_id, self.shard_count, self.bot_token, recv_conn),
+            name=f"bot-shard-{shard_id}",
+            daemon=True
+        )
+        process.start()
+        recv_conn.close()
+
+        self.workers[shard_id] = process
+        self.pipes[shard_id] = send_conn
+        self.dead_since.pop(shard_id, None)
+        logger.info(f"🚀 Shard {shard_id} started (pid {process.pid})")
+
+    def start(self) -> None:
+        for shard_id in range(self.shard_count):
+            self.spawn(shard_id)
+
+    def stop(self) -> None:
+        for shard_id, conn in self.pipes.items():
+            conn.close()
+        for process in self.workers.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for sender in self.senders.values():
+            sender.shutdown(wait=False)
+
+    def mark_dead(self, shard_id: int) -> None:
+        if shard_id not in self.dead_since:
+            self.dead_since[shard_id] = time.monotonic()
+            logger.error(f"❌ Shard {shard_id} died, rebalancing its users to {self.live_shards}")
+
+    def check_workers(self) -> None:
+        """Drop dead workers from routing and respawn them after a backoff"""
+        now = time.monotonic()
+        for shard_id, process in list(self.workers.items()):
+            if not process.is_alive():
+                self.mark_dead(shard_id)
+            if shard_id in self.dead_since and now - self.dead_since[shard_id] >= RESTART_BACKOFF:
+                self.spawn(shard_id)
+
+    def shard_for(self, user_id: int) -> Optional[int]:
+        """Shard owning the user: their home shard, or the one that took them over"""
+        shard_id = self.assigned.get(user_id)
+        if shard_id is not None and shard_id not in self.dead_since:
+            return shard_id
+        self.assigned.pop(user_id, None)
+
+        shard_id = pick_shard(user_id, self.live_shards)
+        if shard_id is not None and shard_id != pick_shard(user_id, list(self.workers)):
+            # Home shard is down: stick to this one, it will hold the user's state
+            self.assigned[user_id] = shard_id
+        return shard_id
+
+    def dispatch(self, user_id: int, data: dict) -> None:
+        """Queue an update on its shard's sender thread"""
+        shard_id = self.shard_for(user_id)
+        if shard_id is None:
+            logger.error("No live shards, dropping update")
+            return
+        conn = self.pipes[shard_id]
+        future = asyncio.get_running_loop().run_in_executor(self.senders[shard_id], conn.send, data)
+        future.add_done_callback(lambda done: self._sent(done, shard_id, conn, user_id, data))
+
+    def _sent(self, future: asyncio.Future, shard_id: int, conn, user_id: int, data: dict) -> None:
+        if future.cancelled() or future.exception() is None:
+            return
+        if not isinstance(future.exception(), (BrokenPipeError, EOFError, OSError)):
+            logger.error(f"Routing update to shard {shard_id} failed: {future.exception()}")
+            return
+        if self.pipes.get(shard_id) is conn:
+            self.mark_dead(shard_id)
+        # else the shard was respawned meanwhile and its old pipe closed
+        self.dispatch(user_id, data)
+
+    async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Forward an update to its shard and stop local handling"""
+        self.dispatch(update_user_id(update), update.to_dict())
+        raise ApplicationHandlerStop
+
+    async def supervise(self) -> None:
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            self.check_workers()
+
+
+def run_sharded(bot_token: str, shard_count: int) -> None:
+    """Front process: poll Telegram and route updates to `shard_count` workers"""
+    router = ShardRouter(bot_token, shard_count)
+    router.start()
+
+    async def post_init(application: Application) -> None:
+        application.create_task(router.supervise())
+
+    application = Application.builder().token(bot_token).post_init(post_init).build()
+    application.add_handler(TypeHandler(Update, router.route), group=-1)
+
+    print(f"🤖 TempMail OTP Bot Started! ({shard_count} shards)")
+    print("Press Ctrl+C to stop")
+
+    try:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+    finally:
+        router.stop()
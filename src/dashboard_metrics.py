@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Dashboard Metrics
+In-memory ring-buffer time series aggregated on the server for the dashboard
+"""
+
+import time
+from collections import deque
+from datetime import date
+from typing import Dict, List, Optional
+
+# Defaults
+SERIES_SECONDS = 300  # 5 minutes of per-second history
+LATENCY_WINDOW = 300  # seconds of latency samples used for percentiles
+MAX_LATENCY_SAMPLES = 10000
+MAX_RECENT_EVENTS = 50
+
+
+class RingSeries:
+    """Per-second values in a fixed-size ring (old seconds are overwritten)"""
+
+    def __init__(self, seconds: int = SERIES_SECONDS):
+        self.size = seconds
+        self.values = [0] * seconds
+        self.stamps = [0] * seconds  # which second each slot currently holds
+
+    def _slot(self, second: int) -> int:
+        index = second % self.size
+        if self.stamps[index] != second:
+            self.stamps[index] = second
+            self.values[index] = 0
+        return index
+
+    def add(self, amount: int = 1, now: Optional[float] = None) -> None:
+        second = int(time.time() if now is None else now)
+        self.values[self._slot(second)] += amount
+
+    def set(self, value: int, now: Optional[float] = None) -> None:
+        second = int(time.time() if now is None else now)
+        self.values[self._slot(second)] = value
+
+    def last(self, seconds: int, now: Optional[float] = None) -> List[int]:
+        """Values for the last `seconds` seconds, oldest first (missing = 0)"""
+        current = int(time.time() if now is None else now)
+        result = []
+        for second in range(current - seconds + 1, current + 1):
+            index = second % self.size
+            result.append(self.values[index] if self.stamps[index] == second else 0)
+        return result
+
+
+class LatencyWindow:
+    """Recent latency samples for percentile queries"""
+
+    def __init__(self, window: float = LATENCY_WINDOW, max_samples: int = MAX_LATENCY_SAMPLES):
+        self.window = window
+        self.samples = deque(maxlen=max_samples)  # (timestamp, seconds)
+
+    def add(self, latency: float, now: Optional[float] = None) -> None:
+        self.samples.append((time.time() if now is None else now, latency))
+
+    def percentiles(self, now: Optional[float] = None) -> Dict[str, int]:
+        """p50/p95/p99 in milliseconds over the window"""
+        cutoff = (time.time() if now is None else now) - self.window
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+        values = sorted(latency for _, latency in self.samples)
+        if not values:
+            return {'p50': 0, 'p95': 0, 'p99': 0}
+
+        def pick(p: float) -> int:
+            return int(values[min(len(values) - 1, int(p * len(values)))] * 1000)
+
+        return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99)}
+
+
+class DashboardMetrics:
+    """Aggregates delivery counts, latency and connection counts"""
+
+    def __init__(self):
+        self.deliveries = RingSeries()
+        self.connections = RingSeries()
+        self.latency = LatencyWindow()
+        self.recent_events = deque(maxlen=MAX_RECENT_EVENTS)
+        self.event_seq = 0
+        self.delivered_today = 0
+        self._today = date.today()
+
+    def _roll_over(self) -> None:
+        """Reset delivered_today at midnight"""
+        today = date.today()
+        if today != self._today:
+            self._today = today
+            self.delivered_today = 0
+
+    def record_delivery(self, user_id: str, sender: str = '', domain: str = '') -> None:
+        """Count an OTP delivery and keep it for the activity log (OTP itself is not stored)"""
+        self._roll_over()
+        self.delivered_today += 1
+
+        self.deliveries.add(1)
+        self.event_seq += 1
+        self.recent_events.append({
+            'id': self.event_seq,
+            'type': 'otp_delivered',
+            'user_id': user_id,
+            'sender': sender,
+            'domain': domain,
+            'timestamp': time.time()
+        })
+
+    def record_latency(self, latency: float) -> None:
+        self.latency.add(latency)
+
+    def sample_connections(self, connections: int) -> None:
+        self.connections.set(connections)
+
+    def snapshot(self, connected_users: int, connections: int, pending_otps: int, history: int = 60) -> Dict:
+        """Build one dashboard frame (computed once, shared by all viewers)"""
+        self._roll_over()  # No delivery yet today: don't keep showing yesterday's count
+        return {
+            'type': 'snapshot',
+            'connected_users': connected_users,
+            'connections': connections,
+            'pending_otps': pending_otps,
+            'delivered_today': self.delivered_today,
+            'deliveries_per_sec': self.deliveries.last(history),
+            'connections_series': self.connections.last(history),
+            'latency_ms': self.latency.percentiles(),
+            'events': list(self.recent_events)[-10:],
+            'timestamp': time.time()
+        }
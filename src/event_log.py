@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Per-user Event Log
+Sequence-numbered, bounded replay log so reconnecting clients can resume
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+# Defaults
+REPLAY_LOG_SIZE = 50  # events kept per user
+REPLAY_LOG_TTL = 3600  # seconds a user's log survives without new events
+
+
+class EventLog:
+    """Assigns monotonically increasing sequence numbers and keeps recent events per user
+
+    Sequence numbers follow the wall clock in microseconds (never going
+    backwards), so they keep increasing across server restarts and across
+    workers sharing events through the backplane.
+    """
+
+    def __init__(self, max_per_user: int = REPLAY_LOG_SIZE, ttl: float = REPLAY_LOG_TTL):
+        self.max_per_user = max_per_user
+        self.ttl = ttl
+        self._last_seq = 0
+        # user_id -> (deque of events, highest evicted seq); ordered by last append
+        self._logs: 'OrderedDict[str, Tuple[deque, int]]' = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        # Seqs up to here may be in logs we no longer have (reaped, or before this process started)
+        self._forgotten_seq = int(time.time() * 1_000_000)
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def next_seq(self) -> int:
+        self._last_seq = max(int(time.time() * 1_000_000), self._last_seq + 1)
+        return self._last_seq
+
+    def append(self, user_id: str, data: Dict) -> Dict:
+        """Record an event, tagging it with the next sequence number unless it has one"""
+        seq = data.get('seq')
+        if seq is None:
+            seq = self.next_seq()
+        else:
+            # Event from another worker: later local seqs must stay above it
+            self._last_seq = max(self._last_seq, seq)
+        item = dict(data, seq=seq)
+
+        log, evicted = self._logs.pop(user_id, (None, 0))
+        if log is None:
+            log = deque(maxlen=self.max_per_user)
+        if len(log) == log.maxlen:
+            evicted = log[0]['seq']
+        log.append(item)
+
+        # Re-insert at the end: dict order == last activity order
+        self._logs[user_id] = (log, evicted)
+        self._touched[user_id] = time.monotonic()
+        return item
+
+    def since(self, user_id: str, seq: int) -> Tuple[List[Dict], bool]:
+        """Events with seq > `seq`, plus whether missed events may be gone (evicted or reaped)"""
+        entry = self._logs.get(user_id)
+        if entry is None:
+            return [], seq < self._forgotten_seq
+
+        log, evicted = entry
+        events = [item for item in log if item['seq'] > seq]
+        return events, seq < evicted
+
+    def last_seq(self, user_id: str) -> Optional[int]:
+        entry = self._logs.get(user_id)
+        if entry is None or not entry[0]:
+            return None
+        return entry[0][-1]['seq']
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Drop logs of users idle longer than the TTL (oldest first, O(expired))"""
+        now = time.monotonic() if now is None else now
+        expired = 0
+        while self._logs:
+            user_id = next(iter(self._logs))
+            if now - self._touched[user_id] < self.ttl:
+                break
+            log, _ = self._logs.pop(user_id)
+            if log:
+                self._forgotten_seq = max(self._forgotten_seq, log[-1]['seq'])
+            del self._touched[user_id]
+            expired += 1
+        return expired
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Health Checks
+Event loop lag and temp mail provider reachability for liveness/readiness probes
+"""
+
+import asyncio
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from typing import Dict, Optional
+
+# Defaults
+LAG_SAMPLE_INTERVAL = 0.5  # seconds between loop lag samples
+LAG_SAMPLES = 120  # one minute of samples
+PROVIDER_CHECK_INTERVAL = 60  # seconds between provider probes
+PROVIDER_TIMEOUT = 5  # seconds
+
+# Endpoints used by tempmail_otp; any answer below 500 means reachable
+PROVIDERS = {
+    'mail.tm': 'https://api.mail.tm/domains',
+    'guerrillamail': 'http://api.guerrillamail.com/ajax.php',
+}
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a sleeping task
+
+    The bot and the server share this loop when run by the supervisor,
+    so a blocking handler in either shows up here.
+    """
+
+    def __init__(self, interval: float = LAG_SAMPLE_INTERVAL, samples: int = LAG_SAMPLES):
+        self.interval = interval
+        self.samples = deque(maxlen=samples)
+
+    async def run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.monotonic() - start - self.interval))
+
+    @property
+    def current(self) -> float:
+        return self.samples[-1] if self.samples else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            'current_ms': round(self.current * 1000, 1),
+            'max_ms': round(max(self.samples, default=0.0) * 1000, 1)
+        }
+
+
+def probe(url: str, timeout: float = PROVIDER_TIMEOUT) -> Dict:
+    """One blocking HTTP GET, returns reachability and latency"""
+    start = time.monotonic()
+    try:
+        request = urllib.request.Request(url, headers={'User-Agent': 'tempmail-bot-health'})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError) as e:
+        return {'ok': False, 'error': str(e), 'checked_at': time.time()}
+
+    return {
+        'ok': status < 500,
+        'status': status,
+        'latency_ms': int((time.monotonic() - start) * 1000),
+        'checked_at': time.time()
+    }
+
+
+class ProviderHealth:
+    """Periodically probes the temp mail providers in a worker thread"""
+
+    def __init__(self, providers: Dict[str, str] = PROVIDERS, interval: float = PROVIDER_CHECK_INTERVAL):
+        self.providers = providers
+        self.interval = interval
+        self.results: Dict[str, Dict] = {}
+
+    async def check(self) -> None:
+        results = await asyncio.gather(
+            *(asyncio.to_thread(probe, url) for url in self.providers.values())
+        )
+        self.results = dict(zip(self.providers, results))
+
+    async def run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def any_up(self) -> Optional[bool]:
+        """True if a provider answered, None before the first probe"""
+        if not self.results:
+            return None
+        return any(result['ok'] for result in self.results.values())
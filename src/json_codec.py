@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+JSON Codec
+Uses a fast JSON library when installed, falls back to the stdlib
+"""
+
+import json
+import os
+
+# 'auto' picks the fastest available; or force 'orjson', 'ujson', 'json'
+JSON_CODEC = os.getenv('JSON_CODEC', 'auto').lower()
+
+
+def _stdlib():
+    encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+    return 'json', encoder.encode, json.loads
+
+
+def _orjson():
+    import orjson
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    return 'orjson', dumps, orjson.loads
+
+
+def _ujson():
+    import ujson
+
+    def dumps(obj) -> str:
+        return ujson.dumps(obj, ensure_ascii=False)
+
+    return 'ujson', dumps, ujson.loads
+
+
+def _select():
+    candidates = {
+        'orjson': [_orjson],
+        'ujson': [_ujson],
+        'json': [],
+    }.get(JSON_CODEC, [_orjson, _ujson])
+
+    for factory in candidates:
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return _stdlib()
+
+
+CODEC_NAME, dumps, loads = _select()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Message Content Cache
+LRU cache of fetched message bodies, with parsed text and extracted OTP
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+# Default budget for cached message content
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # 16 MB
+
+
+def _entry_size(content: Dict, text: str) -> int:
+    """Approximate memory cost of a cache entry in bytes"""
+    size = len(text.encode('utf-8', 'ignore'))
+    for value in content.values():
+        if isinstance(value, str):
+            size += len(value.encode('utf-8', 'ignore'))
+    return size
+
+
+class MessageCache:
+    """LRU cache bounded by total content size in bytes
+
+    Entries are dicts with 'content' (provider response), 'text' (parsed
+    text used for OTP search) and 'otp' (extracted code or None).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: 'OrderedDict[Hashable, Dict]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        """Return cached entry and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, content: Dict, text: str, otp: Optional[str]) -> Dict:
+        """Store a message, evicting least recently used entries over the byte budget"""
+        size = _entry_size(content, text)
+        self.discard(key)
+
+        entry = {'content': content, 'text': text, 'otp': otp, 'size': size}
+        if size > self.max_bytes:
+            # Too large to cache, hand it back without storing
+            return entry
+
+        self._entries[key] = entry
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted['size']
+
+        return entry
+
+    def discard(self, key: Hashable) -> None:
+        """Remove a single entry if present"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry['size']
+
+    def stats(self) -> Dict:
+        """Entry count, memory use and hit ratio"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Pending OTP Queue
+Bounded per-user queue of unacknowledged OTPs with TTL expiry
+"""
+
+import itertools
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List
+
+# Defaults
+MAX_PENDING_PER_USER = 10
+PENDING_TTL = 600  # seconds (10 minutes)
+
+
+class PendingOTPQueue:
+    """Per-user OTP queue with sequence IDs, cumulative acks and TTL
+
+    Every pushed item gets a `seq` that increases monotonically (also across
+    server restarts, since it starts from the current time in ms). Items stay
+    queued until the extension acks them or they expire, so they can be
+    retransmitted when the extension reconnects.
+    """
+
+    def __init__(self, max_per_user: int = MAX_PENDING_PER_USER, ttl: float = PENDING_TTL):
+        self.max_per_user = max_per_user
+        self.ttl = ttl
+        self._seq = itertools.count(int(time.time() * 1000))
+        self._queues: Dict[str, 'OrderedDict[int, Dict]'] = {}
+        # (expires_at, user_id, seq) in push order == expiry order, since TTL is constant
+        self._expiry = deque()
+        self._count = 0
+        self.expired = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        """Total pending items across all users"""
+        return self._count
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._queues
+
+    def users(self) -> int:
+        """Number of users with pending items"""
+        return len(self._queues)
+
+    def push(self, user_id: str, data: Dict) -> Dict:
+        """Queue an item for a user, returns it with `seq` assigned
+
+        Items that already carry a `seq` (e.g. from the event log) keep it;
+        it must be higher than any seq queued before for the user.
+        """
+        seq = data.get('seq') or next(self._seq)
+        item = dict(data, seq=seq)
+
+        queue = self._queues.setdefault(user_id, OrderedDict())
+        queue[seq] = item
+        self._count += 1
+        self._expiry.append((time.monotonic() + self.ttl, user_id, seq))
+
+        # Bounded: drop the oldest item when the user's queue is full
+        while len(queue) > self.max_per_user:
+            queue.popitem(last=False)
+            self._count -= 1
+            self.dropped += 1
+
+        return item
+
+    def pending(self, user_id: str) -> List[Dict]:
+        """Unacked items for a user, oldest first"""
+        queue = self._queues.get(user_id)
+        return list(queue.values()) if queue else []
+
+    def ack(self, user_id: str, seq: int) -> List[Dict]:
+        """Cumulative ack: remove every item with seq <= `seq`, returns the removed items"""
+        queue = self._queues.get(user_id)
+        if not queue:
+            return []
+
+        removed = []
+        while queue:
+            first_seq = next(iter(queue))
+            if first_seq > seq:
+                break
+            removed.append(queue.popitem(last=False)[1])
+
+        self._count -= len(removed)
+        if not queue:
+            del self._queues[user_id]
+        return removed
+
+    def reap(self, now: float = None) -> int:
+        """Purge expired items; cost is proportional to the number expired"""
+        now = time.monotonic() if now is None else now
+        expired = 0
+
+        while self._expiry and self._expiry[0][0] <= now:
+            _, user_id, seq = self._expiry.popleft()
+            queue = self._queues.get(user_id)
+            if queue is None or queue.pop(seq, None) is None:
+                continue  # Already acked or dropped
+            expired += 1
+            self._count -= 1
+            if not queue:
+                del self._queues[user_id]
+
+        self.expired += expired
+        return expired
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Poll Scheduler
+Runs due jobs (inbox creations and polls) on one bounded thread pool
+"""
+
+import heapq
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+
+class PollScheduler:
+    """Heap of due jobs feeding a thread pool, at most `concurrency` running
+
+    schedule() queues a job for a given time; completed() yields
+    (key, future) as jobs finish, and may be resumed after scheduling the
+    next poll of that key. Used by batch.run_batch() and iter_otps().
+    """
+
+    def __init__(self, concurrency: int, thread_name_prefix: str = 'poll'):
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=thread_name_prefix)
+        self.due = []  # heap of (due_time, order, key, function, args)
+        self.running = {}  # future -> key
+        self._order = itertools.count()
+
+    def __enter__(self) -> 'PollScheduler':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def schedule(self, key: Any, function: Callable, *args, at: Optional[float] = None) -> None:
+        """Run `function(*args)` at monotonic time `at` (now if None)"""
+        due_time = time.monotonic() if at is None else at
+        heapq.heappush(self.due, (due_time, next(self._order), key, function, args))
+
+    def completed(self, until: Optional[float] = None) -> Iterator[Tuple[Any, Future]]:
+        """Yield (key, future) of each finished job until nothing is left or `until` passes"""
+        while self.due or self.running:
+            now = time.monotonic()
+            if until is not None and now >= until:
+                return
+
+            # Start jobs that are due, never more than the pool can run
+            while self.due and self.due[0][0] <= now and len(self.running) < self.concurrency:
+                _, _, key, function, args = heapq.heappop(self.due)
+                self.running[self.executor.submit(function, *args)] = key
+
+            wake = until
+            if self.due and len(self.running) < self.concurrency:
+                wake = self.due[0][0] if wake is None else min(wake, self.due[0][0])
+            wait_for = None if wake is None else max(0.0, wake - now)
+
+            if not self.running:
+                time.sleep(wait_for)
+                continue
+
+            done, _ = wait(self.running, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield self.running.pop(future), future
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
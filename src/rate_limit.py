@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Rate limiting helpers
+Token bucket shared by the Telegram bot and the auto-fill server
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Seconds until `tokens` can be consumed (0 if available now)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def try_consume(self, tokens: float = 1.0, now: Optional[float] = None) -> bool:
+        """Consume tokens if available, return False otherwise"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def is_full(self, now: Optional[float] = None) -> bool:
+        """True when the bucket has fully refilled (safe to forget it)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class SharedTokenBucket(TokenBucket):
+    """Thread-safe token bucket; acquire() blocks until a token is free"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        super().__init__(rate, capacity)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Wait for `tokens`, False if that would take longer than `timeout` seconds"""
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self.wait_time(tokens, now)
+                if delay == 0:
+                    self.tokens -= tokens
+                    return True
+            if give_up is not None and now + delay > give_up:
+                return False
+            time.sleep(delay)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Retry Policy
+Exponential backoff with jitter, per-operation idempotency rules and a
+deadline budget for temp mail provider requests
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import requests
+
+T = TypeVar('T')
+
+# Configuration
+RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', '3'))  # tries per request, including the first
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '0.5'))  # seconds, doubled per retry
+RETRY_MAX_DELAY = 8.0  # seconds
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Rejected before the server did anything: safe to retry non-idempotent requests too
+SAFE_STATUSES = {429, 503}
+
+# Transport errors: CONNECT_ERRORS never reached the server, TRANSIENT_ERRORS may have
+CONNECT_ERRORS: Tuple[type, ...] = (requests.exceptions.ConnectTimeout,)
+TRANSIENT_ERRORS: Tuple[type, ...] = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def register_errors(connect: Tuple[type, ...] = (), transient: Tuple[type, ...] = ()) -> None:
+    """Teach the retry rules another HTTP client's exceptions (e.g. aiohttp)"""
+    global CONNECT_ERRORS, TRANSIENT_ERRORS
+    CONNECT_ERRORS += tuple(connect)
+    TRANSIENT_ERRORS += tuple(transient)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's time budget ran out before the request could be sent"""
+
+
+class Deadline:
+    """Time budget shared by every request of one operation (None = unlimited)"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, default: float) -> float:
+        """Per-request timeout: `default`, shrunk to the time left"""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline habis sebelum request dikirim")
+        return min(default, remaining)
+
+
+NO_DEADLINE = Deadline()
+
+
+class RetryStats:
+    """Retry counters per operation: retries, failures and deadline give-ups"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, outcome: str) -> None:
+        with self._lock:
+            self.counts[(operation, outcome)] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            items = list(self.counts.items())
+        result: Dict[str, Dict[str, int]] = {}
+        for (operation, outcome), count in items:
+            result.setdefault(operation, {})[outcome] = count
+        return result
+
+
+stats = RetryStats()
+
+
+def status_of(error: Exception) -> Optional[int]:
+    """HTTP status of a requests HTTPError or an aiohttp ClientResponseError"""
+    status = getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Retry-After seconds sent with a 429/503, if any"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(error, 'headers', None) or {}
+    value = headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None  # HTTP-date form, fall back to our own backoff
+
+
+class RetryPolicy:
+    """When and how often one kind of request is retried
+
+    idempotent=False only retries failures where the server cannot have
+    acted on the request (connect timeout, 429, 503).
+    """
+
+    def __init__(
+        self,
+        idempotent: bool = True,
+        attempts: int = RETRY_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY
+    ):
+        self.idempotent = idempotent
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def retryable(self, error: Exception) -> bool:
+        status = status_of(error)
+        if status is not None:
+            return status in (RETRY_STATUSES if self.idempotent else SAFE_STATUSES)
+        if isinstance(error, CONNECT_ERRORS):
+            return True  # Never reached the server
+        if isinstance(error, TRANSIENT_ERRORS):
+            return self.idempotent
+        return False
+
+    def backoff(self, retry: int) -> float:
+        """Full jitter: uniform in [0, base * 2^retry], capped"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def _retry_delay(self, operation: str, attempt: int, error: Exception, deadline: Deadline) -> Optional[float]:
+        """Seconds to wait before the next try, or None to give up (counted in stats)"""
+        if isinstance(error, DeadlineExceeded):
+            stats.record(operation, 'deadline')
+            return None
+        if attempt + 1 >= self.attempts or not self.retryable(error):
+            stats.record(operation, 'failed')
+            return None
+
+        delay = max(self.backoff(attempt), retry_after(error) or 0.0)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            stats.record(operation, 'deadline')
+            return None
+        stats.record(operation, 'retries')
+        return delay
+
+    def call(
+        self,
+        operation: str,
+        send: Callable[[float], T],
+        timeout: float,
+        deadline: Optional[Deadline] = None
+    ) -> T:
+        """Run `send(request_timeout)` with retries, re-raising the last error
+
+        Each try gets `timeout` seconds, less if the deadline is closer.
+        Backoff blocks the thread: never call this on an event loop.
+        """
+        deadline = deadline or NO_DEADLINE
+        attempt = 0
+        while True:
+            try:
+                return send(deadline.timeout(timeout))
+            except Exception as e:
+                delay = self._retry_delay(operation, attempt, e, deadline)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(
+        self,
+        operation: str,
+        send: Callable[[float], Awaitable[T]],
+        timeout: float,
+        deadline: Optional[Deadline] = None
+    ) -> T:
+        """Same as call() for coroutines; backoff waits with asyncio.sleep"""
+        deadline = deadline or NO_DEADLINE
+        attempt = 0
+        while True:
+            try:
+                return await send(deadline.timeout(timeout))
+            except Exception as e:
+                delay = self._retry_delay(operation, attempt, e, deadline)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Outbound Telegram send queue
+Prioritized, rate limited delivery of bot notifications
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from telegram.error import RetryAfter
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Priorities (lower value = sent first)
+PRIORITY_OTP = 0
+PRIORITY_STATUS = 1
+PRIORITY_PREVIEW = 2
+
+# Telegram limits: ~30 msgs/s globally, ~1 msg/s per chat
+GLOBAL_RATE = 25
+PER_CHAT_RATE = 1.0
+MAX_IN_FLIGHT = 8  # concurrent send_message calls (one per chat at a time)
+MAX_MESSAGE_LENGTH = 4096
+COALESCE_SEPARATOR = "\n\n" + "─" * 20 + "\n\n"
+REPORT_INTERVAL = 60  # seconds
+LATENCY_SAMPLES = 1000
+
+
+class OutboundMessage:
+    """Single queued send_message call"""
+
+    __slots__ = ('priority', 'seq', 'chat_id', 'text', 'kwargs', 'enqueued_at')
+
+    def __init__(self, priority: int, seq: int, chat_id: int, text: str, kwargs: Dict):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: 'OutboundMessage') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OutboundQueue:
+    """Priority queue drained by one worker under global and per-chat token buckets
+
+    The worker picks messages and starts up to `max_in_flight` sends at
+    once, so throughput isn't capped at one message per round trip and an
+    OTP doesn't wait behind slow sends. A chat has one send in flight at a
+    time, which keeps its messages in order.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE,
+                 max_in_flight: int = MAX_IN_FLIGHT):
+        self.per_chat_rate = per_chat_rate
+        self.max_in_flight = max(1, max_in_flight)
+        self._in_flight: Set[asyncio.Task] = set()
+        self._busy_chats: Set[int] = set()
+        self._heap: List[OutboundMessage] = []
+        self._seq = itertools.count()
+        self._global = TokenBucket(global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._pending_previews: Dict[int, OutboundMessage] = {}
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._last_report = time.monotonic()
+        self._sent_since_report = 0
+        self.bot = None
+
+        # Counters
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.retries = 0
+
+    def set_global_rate(self, rate: float) -> None:
+        """Change the global send rate (e.g. split across shard processes)"""
+        self._global = TokenBucket(rate)
+
+    def start(self, bot) -> None:
+        """Start the worker on the running loop (no-op if already running)"""
+        self.bot = bot
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker and in-flight sends, dropping anything still queued"""
+        tasks = [self._worker] if self._worker else []
+        tasks += list(self._in_flight)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+        self._in_flight.clear()
+        self._busy_chats.clear()
+
+    async def flush(self, timeout: float) -> bool:
+        """Wait until everything queued has been sent, True if the queue emptied in time"""
+        deadline = time.monotonic() + timeout
+        while (self._heap or self._in_flight) and self._worker and not self._worker.done():
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.1)
+        return not self._heap and not self._in_flight
+
+    def enqueue(
+        self,
+        bot,
+        chat_id: int,
+        text: str,
+        priority: int = PRIORITY_STATUS,
+        coalesce: bool = False,
+        **kwargs
+    ) -> None:
+        """Queue a message; coalesce=True merges it into a pending preview for the chat"""
+        self.start(bot)
+
+        if coalesce:
+            pending = self._pending_previews.get(chat_id)
+            if (
+                pending is not None
+                and pending.kwargs == kwargs
+                and len(pending.text) + len(COALESCE_SEPARATOR) + len(text) <= MAX_MESSAGE_LENGTH
+            ):
+                pending.text += COALESCE_SEPARATOR + text
+                self.coalesced += 1
+                return
+
+        msg = OutboundMessage(priority, next(self._seq), chat_id, text, kwargs)
+        heapq.heappush(self._heap, msg)
+        if coalesce:
+            self._pending_previews[chat_id] = msg
+        self._wakeup.set()
+
+    def _next_ready(self, now: float) -> Tuple[Optional[OutboundMessage], float]:
+        """Pop the highest priority message whose chat is idle and whose bucket allows sending"""
+        skipped = []
+        chosen = None
+        wait = float('inf')
+
+        while self._heap:
+            msg = heapq.heappop(self._heap)
+            if msg.chat_id in self._busy_chats:
+                skipped.append(msg)  # Picked again once its chat's send finishes
+                continue
+            bucket = self._chat_buckets.get(msg.chat_id)
+            chat_wait = bucket.wait_time(now=now) if bucket else 0.0
+            if chat_wait <= 0:
+                chosen = msg
+                break
+            wait = min(wait, chat_wait)
+            skipped.append(msg)
+
+        for msg in skipped:
+            heapq.heappush(self._heap, msg)
+
+        return chosen, wait
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            if not self._heap or len(self._in_flight) >= self.max_in_flight:
+                # Woken by enqueue() or a finished send
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            global_wait = self._global.wait_time(now=now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            msg, wait = self._next_ready(now)
+            if msg is None:
+                # Every queued chat is throttled or busy; sleep until one frees up or new work arrives
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=None if wait == float('inf') else wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if self._pending_previews.get(msg.chat_id) is msg:
+                del self._pending_previews[msg.chat_id]
+
+            self._global.try_consume(now=now)
+            bucket = self._chat_buckets.get(msg.chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[msg.chat_id] = TokenBucket(self.per_chat_rate, 1)
+            bucket.try_consume(now=now)
+
+            self._busy_chats.add(msg.chat_id)
+            self._in_flight.add(asyncio.get_running_loop().create_task(self._send(msg)))
+            self._maybe_report()
+
+    async def _send(self, msg: OutboundMessage) -> None:
+        try:
+            await self._deliver(msg)
+        finally:
+            # Before waking the worker, so it sees the free slot
+            self._in_flight.discard(asyncio.current_task())
+            self._busy_chats.discard(msg.chat_id)
+            self._wakeup.set()
+
+    async def _deliver(self, msg: OutboundMessage) -> None:
+        try:
+            await self.bot.send_message(chat_id=msg.chat_id, text=msg.text, **msg.kwargs)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if hasattr(retry_after, 'total_seconds'):
+                retry_after = retry_after.total_seconds()
+            self.retries += 1
+            self._paused_until = time.monotonic() + float(retry_after)
+            heapq.heappush(self._heap, msg)
+            logger.warning(f"Telegram flood control, pausing sends for {retry_after}s")
+            return
+        except Exception as e:
+            self.dropped += 1
+            logger.error(f"Failed to send message to {msg.chat_id}: {e}")
+            return
+
+        self.sent += 1
+        self._sent_since_report += 1
+        self._latencies.append(time.monotonic() - msg.enqueued_at)
+
+    def _maybe_report(self) -> None:
+        now = time.monotonic()
+        if now - self._last_report < REPORT_INTERVAL:
+            return
+        self._last_report = now
+
+        # Forget idle chat buckets so the map doesn't grow forever
+        for chat_id in [c for c, b in self._chat_buckets.items() if b.is_full(now)]:
+            del self._chat_buckets[chat_id]
+
+        if self._sent_since_report:
+            stats = self.stats()
+            logger.info(
+                f"📤 Send queue: {self._sent_since_report} sent, {stats['queued']} queued, "
+                f"latency p50={stats['latency_p50_ms']}ms p95={stats['latency_p95_ms']}ms "
+                f"max={stats['latency_max_ms']}ms"
+            )
+            self._sent_since_report = 0
+
+    def stats(self) -> Dict:
+        """Queue depth, counters and delivery latency over recent sends"""
+        samples = sorted(self._latencies)
+
+        def percentile(p: float) -> int:
+            if not samples:
+                return 0
+            return int(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000)
+
+        return {
+            'queued': len(self._heap),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'retries': self.retries,
+            'latency_p50_ms': percentile(0.50),
+            'latency_p95_ms': percentile(0.95),
+            'latency_max_ms': int(samples[-1] * 1000) if samples else 0,
+        }
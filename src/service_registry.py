@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Sender Service Registry
+Maps sender email domains to service names using a reverse-label trie
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Data file (service -> list of sender domains)
+SERVICE_DOMAINS_FILE = os.getenv(
+    'SERVICE_DOMAINS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'service_domains.json')
+)
+RELOAD_CHECK_INTERVAL = 5  # seconds between data file mtime checks
+
+# Used when the data file is missing or invalid
+DEFAULT_SERVICES: Dict[str, List[str]] = {
+    'shopee': ['shopee.com', 'shopee.co.id'],
+    'tokopedia': ['tokopedia.com'],
+    'gojek': ['gojek.com', 'go-jek.com'],
+    'grab': ['grab.com'],
+    'dana': ['dana.id'],
+    'ovo': ['ovo.id'],
+    'google': ['google.com', 'googlemail.com'],
+    'facebook': ['facebook.com', 'facebookmail.com'],
+    'twitter': ['twitter.com'],
+    'instagram': ['instagram.com']
+}
+
+# Trie node key holding the service name (labels are never None)
+_SERVICE = None
+
+
+def sender_domain(sender: str) -> str:
+    """Extract the domain from 'addr@domain' or 'Name <addr@domain>'"""
+    domain = sender.rsplit('@', 1)[-1]
+    return domain.strip().strip('<>"\' ').rstrip('.').lower()
+
+
+def build_index(services: Dict[str, Iterable[str]]) -> Dict:
+    """Compile service domains into a trie keyed by reversed domain labels"""
+    root: Dict = {}
+    for service, domains in services.items():
+        for domain in domains:
+            node = root
+            for label in reversed(domain.strip().lower().split('.')):
+                node = node.setdefault(label, {})
+            node[_SERVICE] = service
+    return root
+
+
+class ServiceRegistry:
+    """Sender domain -> service lookup with proper suffix matching and hot reload"""
+
+    def __init__(self, path: Optional[str] = SERVICE_DOMAINS_FILE, services: Optional[Dict] = None):
+        self.path = path
+        self._mtime = None
+        self._next_check = 0.0
+        self._index: Dict = {}
+        self.size = 0
+
+        if services is not None:
+            self.load(services)
+        else:
+            self.reload(force=True)
+
+    def load(self, services: Dict[str, Iterable[str]]) -> None:
+        """Replace the registry contents (index is swapped atomically)"""
+        services = {name: list(domains) for name, domains in services.items()}
+        self._index = build_index(services)
+        self.size = sum(len(domains) for domains in services.values())
+
+    def reload(self, force: bool = False) -> bool:
+        """Reload the data file if it changed; returns True when reloaded"""
+        if not self.path:
+            return False
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if force:
+                logger.warning(f"Service registry not found: {self.path}, using defaults")
+                self.load(DEFAULT_SERVICES)
+            return False
+
+        if not force and mtime == self._mtime:
+            return False
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                services = json.load(f)
+        except Exception as e:
+            logger.error(f"Invalid service registry {self.path}: {e}")
+            if force:
+                self.load(DEFAULT_SERVICES)
+            return False
+
+        self.load(services)
+        self._mtime = mtime
+        logger.info(f"Service registry loaded: {self.size} domains")
+        return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            self.reload()
+
+    def lookup(self, sender: str) -> str:
+        """Return the service for a sender, '' if unknown
+
+        Matches whole-label suffixes: 'shopee.co.id' matches
+        'mail.shopee.co.id' but not 'notshopee.co.id'.
+        """
+        self._maybe_reload()
+
+        node = self._index
+        service = ''
+        for label in reversed(sender_domain(sender).split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            service = node.get(_SERVICE, service)
+        return service
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Service Supervisor
+Runs the Telegram bot and the auto-fill server on one event loop (or as
+child processes), restarts crashed services with backoff and shuts down
+gracefully on SIGTERM/SIGINT
+"""
+
+import abc
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SUPERVISOR_MODE = os.getenv('SUPERVISOR_MODE', 'loop').lower()  # 'loop' or 'processes'
+SUPERVISOR_HEALTH_FILE = os.getenv('SUPERVISOR_HEALTH_FILE', '')  # optional JSON health dump
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '15'))  # seconds to drain and flush
+RESTART_BACKOFF_MIN = 1.0  # seconds
+RESTART_BACKOFF_MAX = 60.0
+STABLE_AFTER = 60.0  # a service running this long resets its backoff
+HEALTH_INTERVAL = 5.0  # seconds between health file writes / service checks
+PROCESS_POLL_INTERVAL = 1.0
+
+
+class ServiceExited(RuntimeError):
+    """A service stopped on its own while the supervisor was still running"""
+
+
+class Service(abc.ABC):
+    """Something the supervisor runs: `run` returns once `stop` is requested, raises on crash"""
+
+    name = 'service'
+
+    @abc.abstractmethod
+    async def run(self) -> None:
+        """Run until stopped"""
+
+    @abc.abstractmethod
+    async def stop(self) -> None:
+        """Ask a running `run` to return"""
+
+    def details(self) -> Dict:
+        """Service specific health fields"""
+        return {}
+
+
+class BotService(Service):
+    """Telegram bot (long polling) driven on the supervisor's loop"""
+
+    name = 'bot'
+
+    def __init__(self):
+        self.application = None
+        self._exit: Optional[asyncio.Event] = None
+
+    async def run(self) -> None:
+        from telegram import Update
+        from telegram_bot import build_application, load_bot_token
+
+        bot_token = load_bot_token()
+        if not bot_token:
+            raise RuntimeError("Bot token tidak ditemukan (TELEGRAM_BOT_TOKEN / config/bot_config.json)")
+
+        self._exit = asyncio.Event()
+        application = self.application = build_application(bot_token)
+
+        # run_polling() would own the loop and signals; drive the lifecycle by hand instead
+        await application.initialize()
+        try:
+            if application.post_init:
+                await application.post_init(application)
+            await application.start()
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            logger.info("🤖 Telegram bot polling")
+
+            while not self._exit.is_set():
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._exit.wait(), HEALTH_INTERVAL)
+                if not self._exit.is_set() and not application.updater.running:
+                    raise ServiceExited("updater stopped polling")
+        finally:
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+                # Flush queued Telegram messages while the bot can still send
+                if application.post_stop:
+                    await application.post_stop(application)
+            await application.shutdown()
+
+    async def stop(self) -> None:
+        if self._exit:
+            self._exit.set()
+
+    def details(self) -> Dict:
+        import retry
+
+        return {'provider_retries': retry.stats.snapshot()}
+
+
+class ServerService(Service):
+    """Auto-fill FastAPI server on an embedded uvicorn server"""
+
+    name = 'server'
+
+    def __init__(self, health_provider: Optional[Callable[[], Dict]] = None):
+        self.health_provider = health_provider
+        self.server = None
+        self._stopping = False
+
+    async def run(self) -> None:
+        import uvicorn
+        import websocket_server
+
+        class EmbeddedServer(uvicorn.Server):
+            """uvicorn server that leaves signal handling to the supervisor"""
+
+            def install_signal_handlers(self) -> None:
+                pass
+
+            @contextlib.contextmanager
+            def capture_signals(self):
+                yield
+
+        websocket_server.service_health = self.health_provider
+        config = uvicorn.Config(
+            websocket_server.app,
+            host=websocket_server.SERVER_HOST,
+            port=websocket_server.SERVER_PORT,
+            log_level="info"
+        )
+        self._stopping = False
+        self.server = EmbeddedServer(config)
+
+        try:
+            await self.server.serve()
+        except SystemExit as e:
+            # uvicorn exits the process when it can't bind the port
+            raise ServiceExited(f"uvicorn exited with code {e.code}") from None
+        if not self._stopping:
+            raise ServiceExited("uvicorn stopped")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self.server is None:
+            return
+        import websocket_server
+
+        # Refuse new work, let queued frames reach the extensions, then close
+        await websocket_server.manager.drain(timeout=SHUTDOWN_TIMEOUT / 2)
+        self.server.should_exit = True
+
+    def details(self) -> Dict:
+        import websocket_server
+
+        return {
+            'connections': websocket_server.manager.connection_count,
+            'pending_otps': len(websocket_server.manager.pending_otps)
+        }
+
+
+def run_bot_process() -> None:
+    """Child process entry: the bot's own main() (polling, webhook or shards)"""
+    from telegram_bot import main
+    main()
+
+
+def run_server_process() -> None:
+    """Child process entry: the server's own main() (honours SERVER_WORKERS)"""
+    from websocket_server import main
+    main()
+
+
+class ProcessService(Service):
+    """Runs a service in a child process (multi-core mode)
+
+    The child handles SIGTERM with its own graceful shutdown; it is
+    killed if it doesn't exit within SHUTDOWN_TIMEOUT.
+    """
+
+    def __init__(self, name: str, target: Callable[[], None]):
+        self.name = name
+        self.target = target
+        self.process = None
+        self._stopping = False
+
+    async def run(self) -> None:
+        self._stopping = False
+        self.process = multiprocessing.get_context('spawn').Process(
+            target=self.target, name=f"tempmail-{self.name}"
+        )
+        self.process.start()
+        logger.info(f"🚀 {self.name} started (pid {self.process.pid})")
+
+        while self.process.is_alive():
+            await asyncio.sleep(PROCESS_POLL_INTERVAL)
+
+        if not self._stopping:
+            raise ServiceExited(f"process exited with code {self.process.exitcode}")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        process = self.process
+        if process is None or not process.is_alive():
+            return
+
+        process.terminate()
+        await asyncio.get_running_loop().run_in_executor(None, process.join, SHUTDOWN_TIMEOUT)
+        if process.is_alive():
+            logger.warning(f"⚠️ {self.name} did not exit in {SHUTDOWN_TIMEOUT}s, killing")
+            process.kill()
+
+    def details(self) -> Dict:
+        return {'pid': self.process.pid if self.process else None}
+
+
+class Supervisor:
+    """Runs services until SIGTERM/SIGINT, restarting crashed ones with exponential backoff"""
+
+    def __init__(self, services: List[Service]):
+        self.services = services
+        self.health_state: Dict[str, Dict] = {
+            service.name: {'state': 'starting', 'restarts': 0, 'last_error': None, 'started_at': None}
+            for service in services
+        }
+        self._stop: Optional[asyncio.Event] = None
+
+    def request_stop(self) -> None:
+        if self._stop and not self._stop.is_set():
+            logger.info("🛑 Shutdown requested")
+            self._stop.set()
+
+    def health(self) -> Dict:
+        """Per-service state, restart count, uptime and last error"""
+        now = time.time()
+        services = {}
+        for service in self.services:
+            state = dict(self.health_state[service.name])
+            started_at = state.pop('started_at')
+            state['uptime'] = round(now - started_at, 1) if state['state'] == 'running' and started_at else 0
+            try:
+                state.update(service.details())
+            except Exception:
+                pass
+            services[service.name] = state
+
+        healthy = all(state['state'] == 'running' for state in services.values())
+        return {'status': 'ok' if healthy else 'degraded', 'services': services, 'timestamp': now}
+
+    def _install_signal_handlers(self, loop: asyncio.AbstractEventLoop) -> None:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            if sys.platform != 'win32':  # Windows event loops have no add_signal_handler
+                try:
+                    loop.add_signal_handler(sig, self.request_stop)
+                    continue
+                except RuntimeError:
+                    pass  # Not the main thread
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(self.request_stop))
+
+    async def _supervise(self, service: Service) -> None:
+        state = self.health_state[service.name]
+        delay = RESTART_BACKOFF_MIN
+
+        while not self._stop.is_set():
+            state['state'] = 'running'
+            state['started_at'] = time.time()
+            started = time.monotonic()
+            try:
+                await service.run()
+                if self._stop.is_set():
+                    break
+                raise ServiceExited("returned")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                if time.monotonic() - started >= STABLE_AFTER:
+                    delay = RESTART_BACKOFF_MIN
+
+                state['state'] = 'backoff'
+                state['restarts'] += 1
+                state['last_error'] = f"{type(e).__name__}: {e}"
+                logger.error(f"❌ {service.name} crashed ({state['last_error']}), restarting in {delay:g}s")
+
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                delay = min(delay * 2, RESTART_BACKOFF_MAX)
+
+        state['state'] = 'stopped'
+
+    async def _report_health(self) -> None:
+        while True:
+            with open(SUPERVISOR_HEALTH_FILE, 'w') as f:
+                json.dump(self.health(), f)
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._install_signal_handlers(loop)
+
+        tasks = {service.name: asyncio.create_task(self._supervise(service)) for service in self.services}
+        reporter = asyncio.create_task(self._report_health()) if SUPERVISOR_HEALTH_FILE else None
+
+        await self._stop.wait()
+        print("\n🛑 Stopping all services...")
+
+        # Stop everything concurrently, then wait for each run() to finish its teardown
+        results = await asyncio.gather(
+            *(service.stop() for service in self.services), return_exceptions=True
+        )
+        for service, result in zip(self.services, results):
+            if isinstance(result, Exception):
+                logger.error(f"Stopping {service.name} failed: {result}")
+
+        done, pending = await asyncio.wait(tasks.values(), timeout=SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        if reporter:
+            reporter.cancel()
+
+        for name, task in tasks.items():
+            if task in pending:
+                logger.warning(f"⚠️ {name} did not stop within {SHUTDOWN_TIMEOUT}s")
+        print("✅ All services stopped")
+
+
+def build_services(names: List[str], mode: str = SUPERVISOR_MODE) -> List[Service]:
+    """Services for the given names ('bot', 'server') in 'loop' or 'processes' mode"""
+    if mode == 'processes':
+        targets = {'bot': run_bot_process, 'server': run_server_process}
+        return [ProcessService(name, targets[name]) for name in names]
+
+    bot_mode = os.getenv('TELEGRAM_BOT_MODE', 'polling').lower()
+    bot_shards = int(os.getenv('TELEGRAM_BOT_SHARDS', '1'))
+    server_workers = int(os.getenv('SERVER_WORKERS', '1'))
+
+    services = []
+    for name in names:
+        if name == 'bot':
+            # Sharded / standalone webhook bot manage their own processes and servers
+            standalone = bot_shards > 1 or bot_mode == 'webhook'
+            services.append(ProcessService('bot', run_bot_process) if standalone else BotService())
+        elif name == 'server':
+            # uvicorn can only run multiple workers as its own process
+            services.append(ProcessService('server', run_server_process) if server_workers > 1 else ServerService())
+    return services
+
+
+def run_services(names: List[str], mode: str = SUPERVISOR_MODE) -> None:
+    """Run the named services under a supervisor until SIGTERM/SIGINT"""
+    services = build_services(names, mode)
+    supervisor = Supervisor(services)
+    for service in services:
+        if isinstance(service, ServerService):
+            service.health_provider = supervisor.health
+    asyncio.run(supervisor.run())
@@ -31,7 +31,11 @@ from telegram.ext import (
 )
 
 # Import tempmail generator
-from tempmail_otp import TempMailGenerator
+from tempmail_otp import LogReporter, TempMailGenerator
+from retry import Deadline
+from message_cache import MessageCache
+from service_registry import ServiceRegistry
+from send_queue import OutboundQueue, PRIORITY_OTP, PRIORITY_PREVIEW, PRIORITY_STATUS
 
 # Setup logging
 logging.basicConfig(
@@ -40,6 +44,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Provider errors from the temp mail library go to the log, not stdout
+mail_events = LogReporter(logger)
+
 # Store user sessions
 user_sessions: Dict[int, Dict] = {}
 
@@ -47,6 +54,8 @@ user_sessions: Dict[int, Dict] = {}
 SESSION_EXPIRY = 3600  # 1 hour in seconds
 CLEANUP_INTERVAL = 300  # 5 minutes
 AUTOFILL_SERVER_URL = os.getenv('AUTOFILL_SERVER_URL', 'http://localhost:8000')
+BOT_MODE = os.getenv('TELEGRAM_BOT_MODE', 'polling').lower()  # 'polling' or 'webhook'
+BOT_SHARDS = int(os.getenv('TELEGRAM_BOT_SHARDS', '1'))  # >1 = front process + N worker processes
 
 # Bot configuration
 class BotConfig:
@@ -55,6 +64,62 @@ class BotConfig:
     CHECK_INTERVAL = 3  # seconds
     OTP_TIMEOUT = 180  # 3 minutes
     MAX_SESSIONS = 100  # Max concurrent sessions
+    SEND_RATE_GLOBAL = 25  # msgs/s, below Telegram's ~30/s flood limit
+    SEND_RATE_PER_CHAT = 1  # msgs/s per chat
+    SEND_CONCURRENCY = 8  # send_message calls in flight
+    MESSAGE_CACHE_BYTES = 16 * 1024 * 1024  # Fetched message content cache
+
+
+# Outbound notifications (OTP first, previews coalesced per chat)
+outbound = OutboundQueue(
+    global_rate=BotConfig.SEND_RATE_GLOBAL,
+    per_chat_rate=BotConfig.SEND_RATE_PER_CHAT,
+    max_in_flight=BotConfig.SEND_CONCURRENCY
+)
+
+# Sender domain -> service (config/service_domains.json, hot reloaded)
+service_registry = ServiceRegistry()
+
+# Fetched message content shared by monitor and inbox handlers
+message_cache = MessageCache(max_bytes=BotConfig.MESSAGE_CACHE_BYTES)
+
+
+def message_cache_key(generator: TempMailGenerator, msg_id) -> tuple:
+    """Cache key: provider + inbox + message ID"""
+    return (type(generator.generator).__name__, generator.email, msg_id)
+
+
+async def read_message(generator: TempMailGenerator, msg_id, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+    """Get message content with parsed text and OTP, from cache when possible
+    
+    Raises the provider's error if the message could not be read (not cached),
+    returns None for an empty message. The provider request runs in a worker
+    thread so the shared event loop keeps serving.
+    """
+    key = message_cache_key(generator, msg_id)
+    entry = message_cache.get(key)
+    if entry is not None:
+        return entry
+    
+    full_msg = await asyncio.to_thread(generator.get_message_content, msg_id, deadline)
+    if not full_msg:
+        return None
+    
+    text_to_check = (
+        full_msg.get('subject', '') + ' ' +
+        full_msg.get('body', '') + ' ' +
+        full_msg.get('htmlBody', '')
+    )
+    otp = generator.extract_otp(text_to_check)
+    return message_cache.put(key, full_msg, text_to_check, otp)
+
+
+async def fetch_message(generator: TempMailGenerator, msg_id, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+    """Like read_message(), but None if the message could not be read"""
+    try:
+        return await read_message(generator, msg_id, deadline)
+    except Exception:
+        return None  # Logged by mail_events
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -105,8 +170,8 @@ async def new_email(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     
     try:
         # Initialize generator
-        generator = TempMailGenerator(provider='auto')
-        email = generator.generate_random_email()
+        generator = TempMailGenerator(provider='auto', hooks=mail_events)
+        email = await asyncio.to_thread(generator.generate_random_email)
         
         # Store session
         user_sessions[user_id] = {
@@ -160,10 +225,11 @@ async def check_inbox(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     loading_msg = await update.message.reply_text("📬 Checking inbox...")
     
     try:
-        messages = generator.check_inbox()
+        # First page only; the provider reports the inbox size
+        messages = await asyncio.to_thread(generator.check_inbox)
         
         if messages:
-            response = f"📨 *Inbox ({len(messages)} messages):*\n\n"
+            response = f"📨 *Inbox ({generator.message_count or len(messages)} messages):*\n\n"
             
             for i, msg in enumerate(messages[:5], 1):  # Show max 5 messages
                 # Skip welcome messages in display
@@ -175,15 +241,11 @@ async def check_inbox(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
                 response += f"📝 Subject: {msg.get('subject', 'No subject')}\n"
                 response += f"🕐 Time: {msg.get('date', 'Unknown')}\n"
                 
-                # Try to extract OTP from this message
-                full_msg = generator.get_message_content(msg.get('id'))
-                if full_msg:
-                    text_to_check = (
-                        full_msg.get('subject', '') + ' ' +
-                        full_msg.get('body', '') + ' ' +
-                        full_msg.get('htmlBody', '')
-                    )
-                    otp = generator.extract_otp(text_to_check)
+                # Try to extract OTP from this message (cached after first fetch)
+                cached = await fetch_message(generator, msg.get('id'))
+                if cached:
+                    full_msg = cached['content']
+                    otp = cached['otp']
                     if otp:
                         response += f"🔑 *OTP Found: `{otp}`*\n"
                     else:
@@ -215,31 +277,38 @@ async def monitor_otp_background(
     session['otp_monitoring'] = True
     
     # Send notification
-    await context.bot.send_message(
-        chat_id=user_id,
-        text=f"🔄 *OTP Monitoring Started*\n\n"
+    outbound.enqueue(
+        context.bot,
+        user_id,
+        f"🔄 *OTP Monitoring Started*\n\n"
         f"Email: `{session['email']}`\n"
         f"Timeout: 3 minutes\n\n"
         f"Saya akan notify jika OTP diterima.",
+        priority=PRIORITY_STATUS,
         parse_mode='Markdown'
     )
     
     start_time = asyncio.get_event_loop().time()
     timeout = BotConfig.OTP_TIMEOUT
+    deadline = Deadline(timeout)  # Provider requests shrink their timeouts to the time left
     
     while session.get('otp_monitoring', False):
         # Check timeout
         if asyncio.get_event_loop().time() - start_time > timeout:
-            await context.bot.send_message(
-                chat_id=user_id,
-                text="⏱️ *Timeout!*\nTidak ada OTP dalam 3 menit.\n\nGunakan /otp untuk monitor lagi.",
+            outbound.enqueue(
+                context.bot,
+                user_id,
+                "⏱️ *Timeout!*\nTidak ada OTP dalam 3 menit.\n\nGunakan /otp untuk monitor lagi.",
+                priority=PRIORITY_STATUS,
                 parse_mode='Markdown'
             )
             break
         
         try:
             # Check for new messages
-            messages = generator.check_inbox()
+            # Only new messages, oldest first (Mail.tm pages stop at the first seen one)
+            messages = await asyncio.to_thread(generator.new_messages, session['messages_checked'], deadline)
+            blocked = False  # An older message is waiting for a retry (see poll_otp)
             
             for msg in messages:
                 msg_id = msg.get('id')
@@ -248,30 +317,34 @@ async def monitor_otp_background(
                 if msg_id in session['messages_checked']:
                     continue
                 
-                session['messages_checked'].add(msg_id)
+                # Get full message (parsed text and OTP are cached with it)
+                try:
+                    cached = await read_message(generator, msg_id, deadline)
+                except Exception as e:
+                    # Logged by mail_events; newer messages are still searched
+                    if not generator.read_failed(msg_id, e, session['messages_checked']):
+                        blocked = True
+                    continue
                 
-                # Get full message
-                full_msg = generator.get_message_content(msg_id)
+                generator.read_failures.pop(msg_id, None)
+                if not blocked:
+                    session['messages_checked'].add(msg_id)
                 
-                if full_msg:
-                    # Extract OTP
-                    text_to_check = (
-                        full_msg.get('subject', '') + ' ' +
-                        full_msg.get('body', '') + ' ' +
-                        full_msg.get('htmlBody', '')
-                    )
-                    
-                    otp = generator.extract_otp(text_to_check)
+                if cached:
+                    full_msg = cached['content']
+                    otp = cached['otp']
                     
                     if otp:
                         # OTP found!
-                        await context.bot.send_message(
-                            chat_id=user_id,
-                            text=f"🎉 *OTP BERHASIL DITERIMA!*\n\n"
+                        outbound.enqueue(
+                            context.bot,
+                            user_id,
+                            f"🎉 *OTP BERHASIL DITERIMA!*\n\n"
                             f"📧 Email:\n`{session['email']}`\n\n"
                             f"🔑 *OTP Code:*\n`{otp}`\n\n"
                             f"📨 From: {msg.get('from', 'Unknown')}\n\n"
                             f"_Tap OTP di atas untuk copy_",
+                            priority=PRIORITY_OTP,
                             parse_mode='Markdown'
                         )
                         
@@ -286,20 +359,23 @@ async def monitor_otp_background(
                         session['otp_monitoring'] = False
                         return
                     else:
-                        # Skip welcome messages
-                        if "welcome" in msg.get('subject', '').lower() or "guerrilla" in msg.get('from', '').lower():
+                        # Skip welcome messages; previewed once marked checked
+                        if blocked or "welcome" in msg.get('subject', '').lower() or "guerrilla" in msg.get('from', '').lower():
                             continue
                             
                         # New message but no OTP - show preview
                         message_preview = full_msg.get('body', '')[:200] if full_msg.get('body') else 'No content'
                         
-                        await context.bot.send_message(
-                            chat_id=user_id,
-                            text=f"📨 *Pesan baru* (no OTP detected)\n\n"
+                        outbound.enqueue(
+                            context.bot,
+                            user_id,
+                            f"📨 *Pesan baru* (no OTP detected)\n\n"
                             f"From: {msg.get('from', 'Unknown')}\n"
                             f"Subject: {msg.get('subject', 'No subject')}\n\n"
                             f"Preview:\n_{message_preview}_\n\n"
                             f"⚠️ _OTP tidak terdeteksi. Cek format OTP._",
+                            priority=PRIORITY_PREVIEW,
+                            coalesce=True,
                             parse_mode='Markdown'
                         )
         
@@ -412,13 +488,19 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         generator = session['generator']
         
         try:
-            messages = generator.check_inbox()
+            messages = await asyncio.to_thread(generator.check_inbox)
             
             if messages:
-                response = f"📨 *Inbox ({len(messages)} messages):*\n\n"
+                response = f"📨 *Inbox ({generator.message_count or len(messages)} messages):*\n\n"
                 for msg in messages[:5]:
                     response += f"From: {msg.get('from', 'Unknown')}\n"
-                    response += f"Subject: {msg.get('subject', 'No subject')}\n\n"
+                    response += f"Subject: {msg.get('subject', 'No subject')}\n"
+                    
+                    # Show OTP if the message was already fetched (no network)
+                    cached = message_cache.get(message_cache_key(generator, msg.get('id')))
+                    if cached and cached['otp']:
+                        response += f"🔑 OTP: `{cached['otp']}`\n"
+                    response += "\n"
                 
                 await query.message.reply_text(response, parse_mode='Markdown')
             else:
@@ -585,27 +667,7 @@ async def send_email_to_autofill(user_id: str, email: str):
 
 def detect_service_domain(sender: str) -> str:
     """Detect service from sender email"""
-    sender_lower = sender.lower()
-    
-    services = {
-        'shopee': ['shopee.com', 'shopee.co.id'],
-        'tokopedia': ['tokopedia.com'],
-        'gojek': ['gojek.com', 'go-jek.com'],
-        'grab': ['grab.com'],
-        'dana': ['dana.id'],
-        'ovo': ['ovo.id'],
-        'google': ['google.com', 'googlemail.com'],
-        'facebook': ['facebook.com', 'facebookmail.com'],
-        'twitter': ['twitter.com'],
-        'instagram': ['instagram.com']
-    }
-    
-    for service, domains in services.items():
-        for domain in domains:
-            if domain in sender_lower:
-                return service
-    
-    return ''
+    return service_registry.lookup(sender)
 
 
 async def cleanup_expired_sessions():
@@ -631,9 +693,8 @@ async def cleanup_expired_sessions():
             logger.info(f"Cleaned up {len(expired_users)} expired sessions")
 
 
-def main():
-    """Start the bot"""
-    # Get bot token from environment or config file
+def load_bot_token() -> str:
+    """Get bot token from environment or config file"""
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
     
     if not bot_token:
@@ -654,22 +715,37 @@ def main():
             except:
                 continue
     
-    if not bot_token:
-        print("❌ Bot token tidak ditemukan!")
-        print("\nCara setting bot token:")
-        print("1. Set environment variable: TELEGRAM_BOT_TOKEN")
-        print("2. Atau buat file config/bot_config.json dengan format:")
-        print('   {"telegram_bot_token": "YOUR_BOT_TOKEN"}')
-        print("\n📝 Copy template: cp config/bot_config.example.json config/bot_config.json")
-        return
-    
-    # Create application
-    application = Application.builder().token(bot_token).build()
-    
-    # Start cleanup task
+    return bot_token
+
+
+async def post_init(application: Application) -> None:
+    """Start background tasks once the application is initialized"""
     application.create_task(cleanup_expired_sessions())
-    
-    # Register handlers
+
+
+async def post_stop(application: Application) -> None:
+    """Send what is still queued before the bot shuts down"""
+    if not await outbound.flush(timeout=10):
+        logger.warning(f"⚠️ Dropping {outbound.stats()['queued']} unsent messages on shutdown")
+    await outbound.stop()
+
+
+def build_application(bot_token: str, concurrent_updates=False) -> Application:
+    """Create the bot application with all handlers registered"""
+    application = (
+        Application.builder()
+        .token(bot_token)
+        .concurrent_updates(concurrent_updates)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .build()
+    )
+    register_handlers(application)
+    return application
+
+
+def register_handlers(application: Application) -> None:
+    """Register all command, callback and message handlers"""
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("new", new_email))
     application.add_handler(CommandHandler("check", check_inbox))
@@ -680,6 +756,40 @@ def main():
     application.add_handler(CommandHandler("testotp", test_otp))
     application.add_handler(CallbackQueryHandler(button_callback))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+
+
+def main():
+    """Start the bot"""
+    bot_token = load_bot_token()
+    
+    if not bot_token:
+        print("❌ Bot token tidak ditemukan!")
+        print("\nCara setting bot token:")
+        print("1. Set environment variable: TELEGRAM_BOT_TOKEN")
+        print("2. Atau buat file config/bot_config.json dengan format:")
+        print('   {"telegram_bot_token": "YOUR_BOT_TOKEN"}')
+        print("\n📝 Copy template: cp config/bot_config.example.json config/bot_config.json")
+        return
+    
+    if BOT_MODE == 'webhook':
+        # Webhook mode: updates arrive over HTTP, processed with bounded parallelism
+        from telegram_webhook import WEBHOOK_CONCURRENCY, run_standalone
+        
+        application = build_application(bot_token, concurrent_updates=WEBHOOK_CONCURRENCY)
+        print("🤖 TempMail OTP Bot Started! (webhook mode)")
+        print("Press Ctrl+C to stop")
+        run_standalone(application)
+        return
+    
+    if BOT_SHARDS > 1:
+        # Sharded mode: updates routed by user_id to worker processes
+        from bot_shards import run_sharded
+        
+        run_sharded(bot_token, BOT_SHARDS)
+        return
+    
+    # Create application
+    application = build_application(bot_token)
     
     # Start bot
     print("🤖 TempMail OTP Bot Started!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Telegram Webhook Ingestion
+Receives Telegram updates over HTTP instead of long polling
+"""
+
+import hmac
+import logging
+import os
+from typing import Callable, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WEBHOOK_PATH = os.getenv('TELEGRAM_WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')  # Public base URL, e.g. https://your-domain.com
+WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+WEBHOOK_CONCURRENCY = int(os.getenv('TELEGRAM_WEBHOOK_CONCURRENCY', '16'))
+WEBHOOK_HOST = os.getenv('TELEGRAM_WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('TELEGRAM_WEBHOOK_PORT', '8443'))
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def mount_webhook(
+    app: FastAPI,
+    build: Callable[[], Application],
+    secret_token: str = WEBHOOK_SECRET,
+    path: str = WEBHOOK_PATH,
+    public_url: str = WEBHOOK_URL
+) -> None:
+    """Mount the Telegram update endpoint on a FastAPI app
+
+    `build` creates the Application on startup (not at import, so a missing
+    token fails the server's startup instead of every import). Updates are handed to the application's update queue and processed
+    concurrently, bounded by the application's `concurrent_updates` setting.
+    If `public_url` is empty the webhook is not registered with Telegram,
+    which allows local testing by POSTing recorded Update JSON.
+    """
+    if not secret_token:
+        raise ValueError("TELEGRAM_WEBHOOK_SECRET wajib di-set untuk webhook mode")
+
+    expected = secret_token.encode()
+    application: Optional[Application] = None
+
+    @app.post(path, include_in_schema=False)
+    async def telegram_webhook(request: Request):
+        """Receive a single Telegram Update"""
+        received = request.headers.get(SECRET_HEADER, '').encode()
+        if not hmac.compare_digest(received, expected):
+            raise HTTPException(status_code=403, detail="Invalid secret token")
+        if application is None:
+            raise HTTPException(status_code=503, detail="Bot not started")
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, application.bot)
+        except Exception as e:
+            logger.warning(f"Invalid Telegram update: {e}")
+            raise HTTPException(status_code=400, detail="Invalid update")
+
+        await application.update_queue.put(update)
+        return {"ok": True}
+
+    async def start_application():
+        nonlocal application
+        application = build()
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+
+        if public_url:
+            await application.bot.set_webhook(
+                url=public_url.rstrip('/') + path,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"✅ Telegram webhook set: {public_url.rstrip('/')}{path}")
+        else:
+            logger.info(f"📥 Telegram webhook mounted at {path} (not registered, local mode)")
+
+    async def stop_application():
+        nonlocal application
+        if application is None:
+            return
+        stopping, application = application, None
+        await stopping.stop()
+        if stopping.post_stop:
+            await stopping.post_stop(stopping)
+        await stopping.shutdown()
+
+    app.add_event_handler("startup", start_application)
+    app.add_event_handler("shutdown", stop_application)
+
+
+def run_standalone(application: Application) -> None:
+    """Serve only the webhook endpoint on its own ASGI server"""
+    import uvicorn
+
+    app = FastAPI(title="TempMail OTP Bot Webhook")
+    mount_webhook(app, lambda: application)
+
+    print(f"📥 Webhook server: http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    uvicorn.run(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, log_level="info")
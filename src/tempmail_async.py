@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Async TempMail API
+aiohttp-based inboxes for asyncio apps:
+
+    async with TempMail(provider='auto') as box:
+        print(box.email)
+        otp = await box.wait_for_otp(timeout=120)
+"""
+
+import asyncio
+import random
+import string
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+import retry
+from retry import Deadline, RetryPolicy
+from tempmail_otp import (
+    QUIET, RETRY_POLICIES, GuerrillaMailGenerator, MailEvents, MailTmGenerator, ProviderError, find_otp
+)
+
+# Defaults
+REQUEST_TIMEOUT = 10  # seconds
+DEFAULT_CHECK_INTERVAL = 5  # seconds between inbox checks
+
+# Same per-operation rules as the sync providers, plus inbox deletion
+ASYNC_RETRY_POLICIES = dict(RETRY_POLICIES, delete=RetryPolicy())
+
+# aiohttp failures for the retry rules: connector errors never reached the server
+retry.register_errors(
+    connect=(aiohttp.ClientConnectorError,),
+    transient=(aiohttp.ClientConnectionError, asyncio.TimeoutError)
+)
+
+# Errors a poll survives (the next check tries again)
+POLL_ERRORS = (ProviderError,)
+
+
+class AsyncMailTm:
+    """Mail.tm inbox over aiohttp (token sent per request, so sessions can be shared)"""
+
+    name = 'mailtm'
+    base_url = "https://api.mail.tm"
+
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self.email = None
+        self.token = None
+        self.account_id = None
+
+    async def _request(self, operation: str, method: str, path: str,
+                       deadline: Optional[Deadline] = None, **kwargs):
+        """HTTP request with the operation's retry policy (raises ProviderError once retries are exhausted)"""
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+
+        async def send(timeout):
+            async with self.session.request(
+                method, f"{self.base_url}{path}", headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+            ) as response:
+                response.raise_for_status()
+                if response.status == 204:
+                    return {}
+                return await response.json(content_type=None)
+
+        try:
+            return await ASYNC_RETRY_POLICIES[operation].call_async(
+                f"mailtm.{operation}", send, REQUEST_TIMEOUT, deadline
+            )
+        except Exception as e:  # Also a body that isn't JSON, like the sync client
+            raise ProviderError(self.name, operation, e) from e
+
+    async def create(self) -> str:
+        domains = MailTmGenerator.parse_domains(await self._request('domains', 'GET', '/domains'))
+        if not domains:
+            raise Exception("Tidak dapat mendapatkan domain email")
+
+        login = ''.join(random.choices(string.ascii_lowercase + string.digits, k=random.randint(8, 12)))
+        password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+        credentials = {"address": f"{login}@{domains[0]}", "password": password}
+
+        account = await self._request('create_account', 'POST', '/accounts', json=credentials)
+        self.account_id = account.get('id')
+        self.token = (await self._request('token', 'POST', '/token', json=credentials)).get('token')
+        self.email = credentials['address']
+        return self.email
+
+    async def list_messages(self, deadline: Optional[Deadline] = None) -> List[Dict]:
+        return MailTmGenerator.parse_messages(await self._request('check_inbox', 'GET', '/messages', deadline))
+
+    async def get_message(self, message_id: str, deadline: Optional[Deadline] = None) -> Dict:
+        return MailTmGenerator.parse_message(
+            await self._request('get_message', 'GET', f'/messages/{message_id}', deadline)
+        )
+
+    async def delete(self) -> None:
+        if self.account_id:
+            await self._request('delete', 'DELETE', f'/accounts/{self.account_id}')
+
+
+class AsyncGuerrilla:
+    """Guerrilla Mail inbox over aiohttp (session identified by sid_token, not cookies)"""
+
+    name = 'guerrilla'
+    base_url = "http://api.guerrillamail.com/ajax.php"
+
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self.email = None
+        self.sid_token = None
+
+    async def _call(self, operation: str, function: str,
+                    deadline: Optional[Deadline] = None, **params) -> Dict:
+        """API call with the operation's retry policy (raises ProviderError once retries are exhausted)"""
+        params.update({'f': function, 'ip': '127.0.0.1', 'agent': 'Mozilla/5.0'})
+        if self.sid_token:
+            params['sid_token'] = self.sid_token
+
+        async def send(timeout):
+            async with self.session.get(
+                self.base_url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+        try:
+            return await ASYNC_RETRY_POLICIES[operation].call_async(
+                f"guerrilla.{operation}", send, REQUEST_TIMEOUT, deadline
+            )
+        except Exception as e:  # Also a body that isn't JSON, like the sync client
+            raise ProviderError(self.name, operation, e) from e
+
+    async def create(self) -> str:
+        data = await self._call('create', 'get_email_address', lang='en')
+        self.email = data.get('email_addr')
+        self.sid_token = data.get('sid_token', '')
+        if not self.email:
+            raise Exception("Tidak dapat membuat email")
+        return self.email
+
+    async def list_messages(self, deadline: Optional[Deadline] = None) -> List[Dict]:
+        return GuerrillaMailGenerator.parse_messages(
+            await self._call('check_inbox', 'get_email_list', deadline, offset='0')
+        )
+
+    async def get_message(self, message_id: str, deadline: Optional[Deadline] = None) -> Dict:
+        return GuerrillaMailGenerator.parse_message(
+            await self._call('get_message', 'fetch_email', deadline, email_id=message_id)
+        )
+
+    async def delete(self) -> None:
+        if self.email:
+            await self._call('delete', 'forget_me', email_addr=self.email)
+
+
+PROVIDERS = {'mailtm': AsyncMailTm, 'guerrilla': AsyncGuerrilla}
+
+
+class TempMail:
+    """Async temp inbox with automatic cleanup
+
+    provider: 'mailtm', 'guerrilla', or 'auto' (tries all in order)
+    session: optional shared aiohttp session (e.g. for hundreds of inboxes);
+        otherwise the box opens its own and closes it on exit
+    cleanup: delete the inbox at the provider on exit
+    hooks: MailEvents receiving messages/OTPs/errors (silent if None)
+    """
+
+    def __init__(
+        self,
+        provider: str = 'auto',
+        session: Optional[aiohttp.ClientSession] = None,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+        otp_length: int = 6,
+        cleanup: bool = True,
+        hooks: Optional[MailEvents] = None
+    ):
+        if provider != 'auto' and provider not in PROVIDERS:
+            raise ValueError(f"Unknown provider: {provider}")
+        self.provider = provider
+        self.session = session
+        self.check_interval = check_interval
+        self.otp_length = otp_length
+        self.cleanup = cleanup
+        self.hooks = hooks or QUIET
+        self.client = None
+        self.email = None
+        self._own_session = session is None
+        self._seen = set()
+
+    async def __aenter__(self) -> 'TempMail':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> str:
+        """Create the inbox, returns its address"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar())
+
+        names = list(PROVIDERS) if self.provider == 'auto' else [self.provider]
+        errors = []
+        for name in names:
+            client = PROVIDERS[name](self.session)
+            try:
+                self.email = await client.create()
+            except Exception as e:
+                self.hooks.on_error(name, 'create', e)
+                errors.append(f"{name}: {e}")
+                continue
+            self.client = client
+            self.hooks.on_created(self.email, name)
+            return self.email
+
+        await self.close()
+        raise Exception(f"Semua provider email gagal ({'; '.join(errors)})")
+
+    async def close(self) -> None:
+        """Delete the inbox (if cleanup) and release the HTTP session we opened"""
+        client, self.client = self.client, None
+        if client is not None and self.cleanup:
+            try:
+                await client.delete()
+            except Exception as e:
+                self.hooks.on_error(client.name, 'delete', e)
+
+        if self._own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _require_client(self):
+        if self.client is None:
+            raise Exception("Email belum di-generate")
+        return self.client
+
+    async def check_inbox(self, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Message summaries currently in the inbox"""
+        return await self._require_client().list_messages(deadline)
+
+    async def get_message_content(self, message_id: str, deadline: Optional[Deadline] = None) -> Dict:
+        """Full content of one message"""
+        return await self._require_client().get_message(message_id, deadline)
+
+    async def messages(
+        self, timeout: Optional[float] = None, check_interval: Optional[float] = None
+    ) -> AsyncIterator[Dict]:
+        """Yield each new message once, as it arrives, until `timeout` (None = forever)
+
+        Messages carry from/subject/date plus body, html and the detected otp.
+        """
+        self._require_client()
+        interval = self.check_interval if check_interval is None else check_interval
+        deadline = Deadline(timeout)  # Also shrinks request timeouts near the end
+
+        while True:
+            try:
+                summaries = await self.check_inbox(deadline)
+            except POLL_ERRORS as e:
+                self.hooks.on_error(self.client.name, 'check_inbox', e.error)
+                summaries = []
+
+            for msg in summaries:
+                if msg.get('id') in self._seen:
+                    continue
+                try:
+                    full_msg = await self.get_message_content(msg['id'], deadline)
+                except POLL_ERRORS as e:
+                    self.hooks.on_error(self.client.name, 'get_message', e.error)
+                    continue  # Retried on the next check
+                self._seen.add(msg['id'])
+                otp = find_otp(msg, full_msg, self.otp_length)
+                self.hooks.on_message(self.email, msg, otp)
+                if otp:
+                    self.hooks.on_otp(self.email, otp)
+                yield dict(
+                    msg,
+                    body=full_msg.get('body', ''),
+                    html=full_msg.get('htmlBody', ''),
+                    otp=otp
+                )
+
+            remaining = deadline.remaining()
+            if remaining is None:
+                await asyncio.sleep(interval)
+            elif remaining <= 0:
+                return
+            else:
+                await asyncio.sleep(min(interval, remaining))
+
+    async def wait_for_otp(
+        self, timeout: float = 120, check_interval: Optional[float] = None
+    ) -> Optional[str]:
+        """First OTP found in a new message, or None after `timeout` seconds"""
+        async for msg in self.messages(timeout=timeout, check_interval=check_interval):
+            if msg['otp']:
+                return msg['otp']
+        return None
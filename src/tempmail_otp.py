@@ -4,9 +4,172 @@ import re
 import random
 import string
 import json
-from typing import Optional, List, Dict, Tuple
+import logging
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator, Set
 from datetime import datetime
 
+from poll_scheduler import PollScheduler
+from rate_limit import SharedTokenBucket
+from retry import NO_DEADLINE, Deadline, DeadlineExceeded, RetryPolicy, status_of
+
+
+def extract_otp(text: str, otp_length: int = 6) -> Optional[str]:
+    """Extract OTP code from text using various patterns"""
+    # Common OTP patterns
+    patterns = [
+        r'\b(\d{' + str(otp_length) + r'})\b',  # Exact digit length
+        r'code[:\s]+(\d{4,8})',  # "code: 123456"
+        r'OTP[:\s]+(\d{4,8})',  # "OTP: 123456"
+        r'verification code[:\s]+(\d{4,8})',  # "verification code: 123456"
+        r'código[:\s]+(\d{4,8})',  # Spanish
+        r'kode[:\s]+(\d{4,8})',  # Indonesian
+        r':\s*(\d{4,8})\s*',  # Any number after colon
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return match.group(1)
+    
+    return None
+
+
+def find_otp(msg: Dict, full_msg: Dict, otp_length: int = 6) -> Optional[str]:
+    """Look for an OTP in the subject, then the text body, then the HTML body"""
+    # Try to extract OTP from subject
+    otp = extract_otp(msg.get('subject', ''), otp_length)
+    
+    # If not found in subject, check body
+    if not otp:
+        otp = extract_otp(full_msg.get('body', ''), otp_length)
+    
+    # If not found in text body, check HTML body
+    if not otp:
+        # Remove HTML tags
+        clean_text = re.sub('<.*?>', ' ', full_msg.get('htmlBody', ''))
+        otp = extract_otp(clean_text, otp_length)
+    
+    return otp
+
+
+class MailEvents:
+    """Event hooks for inbox activity
+    
+    Every hook is a no-op, so the library stays silent by default.
+    Subclass and override only the hooks you need (logging, metrics, UI).
+    """
+    
+    def on_created(self, email: str, provider: str) -> None:
+        """An inbox was created"""
+    
+    def on_wait(self, email: str, timeout: float, check_interval: float) -> None:
+        """wait_for_otp started"""
+    
+    def on_poll(self, email: str, elapsed: float, timeout: float) -> None:
+        """A wait_for_otp tick ended without an OTP"""
+    
+    def on_message(self, email: str, msg: Dict, otp: Optional[str]) -> None:
+        """A new message was read (otp is None if it has none)"""
+    
+    def on_otp(self, email: str, otp: str) -> None:
+        """An OTP was found"""
+    
+    def on_timeout(self, email: str, timeout: float) -> None:
+        """wait_for_otp gave up"""
+    
+    def on_error(self, provider: str, operation: str, error: Exception) -> None:
+        """A provider request failed"""
+
+
+QUIET = MailEvents()
+
+
+class ConsoleReporter(MailEvents):
+    """CLI output: emoji lines and a progress line on stdout"""
+    
+    PROVIDER_LABELS = {'mailtm': 'Mail.tm', 'guerrilla': 'GuerrillaMail'}
+    
+    def on_created(self, email, provider):
+        print(f"✅ Email berhasil dibuat: {email}")
+    
+    def on_wait(self, email, timeout, check_interval):
+        print(f"⏳ Menunggu OTP di {email}...")
+        print(f"   Timeout: {timeout} detik, Check interval: {check_interval} detik")
+    
+    def on_poll(self, email, elapsed, timeout):
+        print(f"   Checking... ({int(elapsed)}/{timeout} detik)", end='\r')
+    
+    def on_message(self, email, msg, otp):
+        print(f"\n📧 Pesan baru dari: {msg.get('from', 'Unknown')}")
+        print(f"   Subject: {msg.get('subject', 'No subject')}")
+        print(f"   Time: {msg.get('date', 'Unknown')}")
+        if not otp:
+            print("   ⚠️ OTP tidak ditemukan dalam pesan ini")
+    
+    def on_otp(self, email, otp):
+        print(f"\n🎉 OTP ditemukan: {otp}")
+    
+    def on_timeout(self, email, timeout):
+        print(f"\n⏱️ Timeout! Tidak ada OTP dalam {timeout} detik")
+    
+    def on_error(self, provider, operation, error):
+        print(f"❌ Error {operation} {self.PROVIDER_LABELS.get(provider, provider)}: {error}")
+
+
+class LogReporter(MailEvents):
+    """Events on a logger: provider errors as warnings, the rest at debug level"""
+    
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+    
+    def on_created(self, email, provider):
+        self.logger.debug(f"Inbox created: {email} ({provider})")
+    
+    def on_message(self, email, msg, otp):
+        self.logger.debug(f"New message for {email} from {msg.get('from', 'Unknown')} (otp: {bool(otp)})")
+    
+    def on_otp(self, email, otp):
+        self.logger.debug(f"OTP found for {email}")
+    
+    def on_timeout(self, email, timeout):
+        self.logger.debug(f"No OTP for {email} within {timeout}s")
+    
+    def on_error(self, provider, operation, error):
+        self.logger.warning(f"{provider} {operation} failed: {error}")
+
+
+class ProviderError(Exception):
+    """A provider request still failed after retries (not the same as an empty inbox)"""
+    
+    def __init__(self, provider: str, operation: str, error: Exception):
+        super().__init__(f"{provider} {operation} gagal: {error}")
+        self.provider = provider
+        self.operation = operation
+        self.error = error
+
+
+# Retry rules per provider operation (see retry.py)
+RETRY_POLICIES = {
+    'domains': RetryPolicy(),
+    'create_account': RetryPolicy(idempotent=False),  # A lost response may still have created it
+    'token': RetryPolicy(),  # Login only reads the account
+    'create': RetryPolicy(),  # GuerrillaMail: an abandoned address costs nothing
+    'check_inbox': RetryPolicy(),
+    'get_message': RetryPolicy(),
+}
+
+MAX_READ_FAILURES = 3  # Polls that may fail to read one message before it is skipped
+
+
+def spend_budget(budget: Optional[SharedTokenBucket], deadline: Optional[Deadline], timeout: float) -> float:
+    """Wait for one request token of a shared budget, returns the request timeout left"""
+    if budget is None:
+        return timeout
+    deadline = deadline or NO_DEADLINE
+    if not budget.acquire(timeout=deadline.remaining()):
+        raise DeadlineExceeded("Deadline habis menunggu kuota request")
+    return deadline.timeout(timeout)
+
 
 class MailTmGenerator:
     """Class untuk generate tempmail menggunakan Mail.tm API"""
@@ -14,13 +177,16 @@ class MailTmGenerator:
     # Request timeout in seconds
     REQUEST_TIMEOUT = 10
     
-    def __init__(self):
+    def __init__(self, hooks: Optional[MailEvents] = None):
         """Initialize Mail.tm Generator"""
+        self.hooks = hooks or QUIET
         self.base_url = "https://api.mail.tm"
         self.email = None
         self.password = None
         self.token = None
         self.account_id = None
+        self.message_count = None  # hydra:totalItems of the last inbox page read
+        self.budget: Optional[SharedTokenBucket] = None  # shared request budget (iter_otps)
         self.session = requests.Session()
         self.session.timeout = self.REQUEST_TIMEOUT
         
@@ -44,29 +210,31 @@ class MailTmGenerator:
         
         # Register account
         if self._create_account():
-            print(f"✅ Email berhasil dibuat: {self.email}")
             return self.email
         else:
             raise Exception("Gagal membuat account email")
     
+    def _request(self, operation: str, method: str, path: str,
+                 deadline: Optional[Deadline] = None, **kwargs) -> requests.Response:
+        """HTTP request with the operation's retry policy"""
+        def send(timeout):
+            timeout = spend_budget(self.budget, deadline, timeout)
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs)
+            response.raise_for_status()
+            return response
+        
+        return RETRY_POLICIES[operation].call(f"mailtm.{operation}", send, self.REQUEST_TIMEOUT, deadline)
+    
     def _get_available_domains(self) -> List[str]:
         """Get list of available email domains from Mail.tm"""
         try:
-            response = self.session.get(f"{self.base_url}/domains", timeout=self.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract domain names
-            domains = []
-            if 'hydra:member' in data:
-                for domain_obj in data['hydra:member']:
-                    if domain_obj.get('isActive', False):
-                        domains.append(domain_obj['domain'])
-            
-            return domains
+            domains = self.parse_domains(self._request('domains', 'GET', '/domains').json())
         except Exception as e:
-            print(f"❌ Error mendapatkan domain Mail.tm: {e}")
+            self.hooks.on_error('mailtm', 'domains', e)
             return []
+        if not domains:
+            self.hooks.on_error('mailtm', 'domains', Exception("Tidak ada domain aktif"))
+        return domains
     
     def _create_account(self) -> bool:
         """Create account on Mail.tm"""
@@ -77,85 +245,110 @@ class MailTmGenerator:
                 "password": self.password
             }
             
-            response = self.session.post(
-                f"{self.base_url}/accounts",
-                json=register_data,
-                timeout=self.REQUEST_TIMEOUT
-            )
+            account_data = self._request('create_account', 'POST', '/accounts', json=register_data).json()
+            self.account_id = account_data.get('id')
             
-            if response.status_code in [200, 201]:
-                account_data = response.json()
-                self.account_id = account_data.get('id')
-                
-                # Login to get token
-                login_response = self.session.post(
-                    f"{self.base_url}/token",
-                    json=register_data,
-                    timeout=self.REQUEST_TIMEOUT
-                )
-                
-                if login_response.status_code == 200:
-                    token_data = login_response.json()
-                    self.token = token_data.get('token')
-                    
-                    # Set authorization header for future requests
-                    self.session.headers.update({
-                        'Authorization': f'Bearer {self.token}'
-                    })
-                    
-                    return True
+            # Login to get token
+            token_data = self._request('token', 'POST', '/token', json=register_data).json()
+            self.token = token_data.get('token')
             
-            return False
+            # Set authorization header for future requests
+            self.session.headers.update({
+                'Authorization': f'Bearer {self.token}'
+            })
+            
+            return True
             
         except Exception as e:
-            print(f"❌ Error creating Mail.tm account: {e}")
+            self.hooks.on_error('mailtm', 'create_account', e)
             return False
     
-    def check_inbox(self) -> List[Dict]:
-        """Check inbox for new messages"""
+    def check_inbox(self, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Newest messages, first page only (raises ProviderError once retries are exhausted)
+        
+        The size of the whole inbox is in self.message_count; use
+        iter_messages() to read further pages.
+        """
+        return self.parse_messages(self._messages_page('/messages', deadline))
+    
+    def _messages_page(self, path: str, deadline: Optional[Deadline] = None) -> Dict:
+        """One /messages page, updating message_count"""
         if not self.token:
             raise Exception("Email belum di-generate atau login gagal")
         
         try:
-            response = self.session.get(f"{self.base_url}/messages", timeout=self.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            data = response.json()
-            
-            messages = []
-            if 'hydra:member' in data:
-                for msg in data['hydra:member']:
-                    messages.append({
-                        'id': msg.get('id'),
-                        'from': msg.get('from', {}).get('address', 'Unknown'),
-                        'subject': msg.get('subject', 'No subject'),
-                        'date': msg.get('createdAt', 'Unknown'),
-                        'intro': msg.get('intro', '')
-                    })
-            
-            return messages
+            data = self._request('check_inbox', 'GET', path, deadline).json()
         except Exception as e:
-            print(f"❌ Error checking Mail.tm inbox: {e}")
-            return []
+            self.hooks.on_error('mailtm', 'check_inbox', e)
+            raise ProviderError('mailtm', 'check_inbox', e) from e
+        self.message_count = data.get('hydra:totalItems', len(data.get('hydra:member', [])))
+        return data
     
-    def get_message_content(self, message_id: str) -> Dict:
-        """Get full content of a specific message"""
+    def iter_messages(self, seen: Optional[Set] = None,
+                      deadline: Optional[Deadline] = None) -> Iterator[Dict]:
+        """Lazily yield message summaries, newest first, one page at a time
+        
+        Follows the hydra:view next links and stops at the first message ID
+        in `seen`: everything after it is older and already known.
+        """
+        path = '/messages'
+        while path:
+            data = self._messages_page(path, deadline)
+            for msg in data.get('hydra:member', []):
+                if seen is not None and msg.get('id') in seen:
+                    return
+                yield self.parse_summary(msg)
+            
+            next_path = data.get('hydra:view', {}).get('hydra:next')
+            path = next_path if next_path != path else None
+    
+    def get_message_content(self, message_id: str, deadline: Optional[Deadline] = None) -> Dict:
+        """Get full content of a specific message (raises ProviderError once retries are exhausted)"""
         if not self.token:
             raise Exception("Email belum di-generate atau login gagal")
         
         try:
-            response = self.session.get(f"{self.base_url}/messages/{message_id}", timeout=self.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            msg = response.json()
-            
-            return {
-                'body': msg.get('text', ''),
-                'htmlBody': ''.join(msg.get('html', [])) if msg.get('html') else '',
-                'subject': msg.get('subject', ''),
-                'from': msg.get('from', {}).get('address', 'Unknown')
-            }
+            return self.parse_message(
+                self._request('get_message', 'GET', f'/messages/{message_id}', deadline).json()
+            )
         except Exception as e:
-            print(f"❌ Error membaca pesan Mail.tm: {e}")
-            return {}
+            self.hooks.on_error('mailtm', 'get_message', e)
+            raise ProviderError('mailtm', 'get_message', e) from e
+    
+    @staticmethod
+    def parse_domains(data: Dict) -> List[str]:
+        """Active domain names from a /domains response"""
+        return [
+            domain_obj['domain']
+            for domain_obj in data.get('hydra:member', [])
+            if domain_obj.get('isActive', False)
+        ]
+    
+    @staticmethod
+    def parse_messages(data: Dict) -> List[Dict]:
+        """Message summaries from one /messages page"""
+        return [MailTmGenerator.parse_summary(msg) for msg in data.get('hydra:member', [])]
+    
+    @staticmethod
+    def parse_summary(msg: Dict) -> Dict:
+        """One message summary from a /messages hydra:member entry"""
+        return {
+            'id': msg.get('id'),
+            'from': msg.get('from', {}).get('address', 'Unknown'),
+            'subject': msg.get('subject', 'No subject'),
+            'date': msg.get('createdAt', 'Unknown'),
+            'intro': msg.get('intro', '')
+        }
+    
+    @staticmethod
+    def parse_message(msg: Dict) -> Dict:
+        """Full content from a /messages/{id} response"""
+        return {
+            'body': msg.get('text', ''),
+            'htmlBody': ''.join(msg.get('html', [])) if msg.get('html') else '',
+            'subject': msg.get('subject', ''),
+            'from': msg.get('from', {}).get('address', 'Unknown')
+        }
 
 
 class GuerrillaMailGenerator:
@@ -164,11 +357,14 @@ class GuerrillaMailGenerator:
     # Request timeout in seconds
     REQUEST_TIMEOUT = 10
     
-    def __init__(self):
+    def __init__(self, hooks: Optional[MailEvents] = None):
         """Initialize Guerrilla Mail Generator"""
+        self.hooks = hooks or QUIET
         self.base_url = "http://api.guerrillamail.com/ajax.php"
         self.email = None
         self.sid_token = None
+        self.message_count = None  # inbox size reported by the last get_email_list
+        self.budget: Optional[SharedTokenBucket] = None  # shared request budget (iter_otps)
         self.session = requests.Session()
         
     def generate_random_email(self) -> str:
@@ -182,8 +378,7 @@ class GuerrillaMailGenerator:
                 'lang': 'en'
             }
             
-            response = self.session.get(self.base_url, params=params, timeout=self.REQUEST_TIMEOUT)
-            response.raise_for_status()
+            response = self._request('create', params)
             data = response.json()
             
             self.email = data.get('email_addr')
@@ -194,17 +389,26 @@ class GuerrillaMailGenerator:
                 self.session.cookies.update({'PHPSESSID': response.cookies['PHPSESSID']})
             
             if self.email:
-                print(f"✅ Email berhasil dibuat: {self.email}")
                 return self.email
             else:
                 raise Exception("Tidak dapat membuat email")
                 
         except Exception as e:
-            print(f"❌ Error generating GuerrillaMail: {e}")
+            self.hooks.on_error('guerrilla', 'create', e)
             raise e
     
-    def check_inbox(self) -> List[Dict]:
-        """Check inbox for new messages"""
+    def _request(self, operation: str, params: Dict, deadline: Optional[Deadline] = None) -> requests.Response:
+        """API call with the operation's retry policy"""
+        def send(timeout):
+            timeout = spend_budget(self.budget, deadline, timeout)
+            response = self.session.get(self.base_url, params=params, timeout=timeout)
+            response.raise_for_status()
+            return response
+        
+        return RETRY_POLICIES[operation].call(f"guerrilla.{operation}", send, self.REQUEST_TIMEOUT, deadline)
+    
+    def check_inbox(self, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Check inbox for new messages (raises ProviderError once retries are exhausted)"""
         if not self.email:
             raise Exception("Email belum di-generate")
         
@@ -216,28 +420,28 @@ class GuerrillaMailGenerator:
                 'offset': '0'
             }
             
-            response = self.session.get(self.base_url, params=params, timeout=self.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            data = response.json()
-            
-            messages = []
-            if 'list' in data:
-                for msg in data['list']:
-                    messages.append({
-                        'id': msg.get('mail_id'),
-                        'from': msg.get('mail_from', 'Unknown'),
-                        'subject': msg.get('mail_subject', 'No subject'),
-                        'date': msg.get('mail_date', 'Unknown'),
-                        'excerpt': msg.get('mail_excerpt', '')
-                    })
-            
-            return messages
+            data = self._request('check_inbox', params, deadline).json()
         except Exception as e:
-            print(f"❌ Error checking GuerrillaMail inbox: {e}")
-            return []
+            self.hooks.on_error('guerrilla', 'check_inbox', e)
+            raise ProviderError('guerrilla', 'check_inbox', e) from e
+        
+        messages = self.parse_messages(data)
+        try:
+            self.message_count = int(data.get('count', len(messages)))
+        except (TypeError, ValueError):
+            self.message_count = len(messages)
+        return messages
     
-    def get_message_content(self, message_id: str) -> Dict:
-        """Get full content of a specific message"""
+    def iter_messages(self, seen: Optional[Set] = None,
+                      deadline: Optional[Deadline] = None) -> Iterator[Dict]:
+        """Message summaries newest first, stopping at the first message ID in `seen`"""
+        for msg in self.check_inbox(deadline):
+            if seen is not None and msg.get('id') in seen:
+                return
+            yield msg
+    
+    def get_message_content(self, message_id: str, deadline: Optional[Deadline] = None) -> Dict:
+        """Get full content of a specific message (raises ProviderError once retries are exhausted)"""
         if not self.email:
             raise Exception("Email belum di-generate")
         
@@ -249,98 +453,180 @@ class GuerrillaMailGenerator:
                 'email_id': message_id
             }
             
-            response = self.session.get(self.base_url, params=params, timeout=self.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            msg = response.json()
-            
-            return {
-                'body': msg.get('mail_body_text', ''),
-                'htmlBody': msg.get('mail_body', ''),
-                'subject': msg.get('mail_subject', ''),
-                'from': msg.get('mail_from', 'Unknown')
-            }
+            return self.parse_message(self._request('get_message', params, deadline).json())
         except Exception as e:
-            print(f"❌ Error membaca pesan GuerrillaMail: {e}")
-            return {}
+            self.hooks.on_error('guerrilla', 'get_message', e)
+            raise ProviderError('guerrilla', 'get_message', e) from e
+    
+    @staticmethod
+    def parse_messages(data: Dict) -> List[Dict]:
+        """Message summaries from a get_email_list response"""
+        return [{
+            'id': msg.get('mail_id'),
+            'from': msg.get('mail_from', 'Unknown'),
+            'subject': msg.get('mail_subject', 'No subject'),
+            'date': msg.get('mail_date', 'Unknown'),
+            'excerpt': msg.get('mail_excerpt', '')
+        } for msg in data.get('list', [])]
+    
+    @staticmethod
+    def parse_message(msg: Dict) -> Dict:
+        """Full content from a fetch_email response"""
+        return {
+            'body': msg.get('mail_body_text', ''),
+            'htmlBody': msg.get('mail_body', ''),
+            'subject': msg.get('mail_subject', ''),
+            'from': msg.get('mail_from', 'Unknown')
+        }
+
+
+PROVIDERS = {
+    'mailtm': MailTmGenerator,
+    'guerrilla': GuerrillaMailGenerator,
+}
 
 
 class TempMailGenerator:
     """Main class yang menggunakan multiple API providers"""
     
-    def __init__(self, provider='auto'):
+    def __init__(self, provider='auto', hooks: Optional[MailEvents] = None):
         """Initialize TempMail Generator
         
         Args:
             provider: 'mailtm', 'guerrilla', or 'auto' (tries all)
+            hooks: MailEvents receiving progress/errors (silent if None,
+                ConsoleReporter() for the classic CLI output)
         """
         self.provider = provider
+        self.hooks = hooks or QUIET
         self.generator = None
         self.email = None
+        self.budget: Optional[SharedTokenBucket] = None
+        self.read_failures: Dict = {}  # message ID -> polls that failed to read it
         
     def generate_random_email(self) -> str:
         """Generate random temporary email address"""
         if self.provider == 'auto':
-            # Try Mail.tm first
+            names = list(PROVIDERS)  # Mail.tm first, then GuerrillaMail
+        elif self.provider in PROVIDERS:
+            names = [self.provider]
+        else:
+            raise ValueError(f"Unknown provider: {self.provider}")
+        
+        for name in names:
+            self.generator = PROVIDERS[name](self.hooks)
+            self.generator.budget = self.budget
             try:
-                print("📧 Mencoba Mail.tm API...")
-                self.generator = MailTmGenerator()
                 self.email = self.generator.generate_random_email()
-                return self.email
-            except Exception as e1:
-                print(f"⚠️ Mail.tm gagal: {e1}")
-                
-                # Try GuerrillaMail
-                try:
-                    print("📧 Mencoba GuerrillaMail API...")
-                    self.generator = GuerrillaMailGenerator()
-                    self.email = self.generator.generate_random_email()
-                    return self.email
-                except Exception as e2:
-                    print(f"⚠️ GuerrillaMail gagal: {e2}")
-                    raise Exception("Semua provider email gagal")
-                    
-        elif self.provider == 'mailtm':
-            self.generator = MailTmGenerator()
-            self.email = self.generator.generate_random_email()
-            return self.email
-            
-        elif self.provider == 'guerrilla':
-            self.generator = GuerrillaMailGenerator()
-            self.email = self.generator.generate_random_email()
+            except Exception:
+                if self.provider != 'auto':
+                    raise
+                continue  # The provider already reported the failing step through hooks
+            self.hooks.on_created(self.email, name)
             return self.email
         
-        else:
-            raise ValueError(f"Unknown provider: {self.provider}")
+        raise Exception("Semua provider email gagal")
+    
+    def share_budget(self, budget: Optional[SharedTokenBucket]) -> None:
+        """Take one token from `budget` before every provider request (None = unlimited)"""
+        self.budget = budget
+        if self.generator:
+            self.generator.budget = budget
     
-    def check_inbox(self) -> List[Dict]:
-        """Check inbox for new messages"""
+    def check_inbox(self, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Newest messages, first page only (raises ProviderError if the provider keeps failing)"""
         if not self.generator:
             raise Exception("Email belum di-generate")
-        return self.generator.check_inbox()
+        return self.generator.check_inbox(deadline)
+    
+    @property
+    def message_count(self) -> Optional[int]:
+        """Total messages in the inbox as of the last check (all pages)"""
+        return self.generator.message_count if self.generator else None
     
-    def get_message_content(self, message_id) -> Dict:
-        """Get full content of a specific message"""
+    def new_messages(self, seen: Set, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Summaries of messages not in `seen`, oldest first
+        
+        Only reads until the first seen message. Handle them in this order
+        and add each ID to `seen` once done, so seen messages are always the
+        oldest ones and the early stop never skips anything.
+        """
         if not self.generator:
             raise Exception("Email belum di-generate")
-        return self.generator.get_message_content(message_id)
+        messages = list(self.generator.iter_messages(seen, deadline))
+        messages.reverse()
+        return messages
+    
+    def get_message_content(self, message_id, deadline: Optional[Deadline] = None) -> Dict:
+        """Get full content of a specific message (raises ProviderError if the provider keeps failing)"""
+        if not self.generator:
+            raise Exception("Email belum di-generate")
+        return self.generator.get_message_content(message_id, deadline)
     
     def extract_otp(self, text: str, otp_length: int = 6) -> Optional[str]:
         """Extract OTP code from text using various patterns"""
-        # Common OTP patterns
-        patterns = [
-            r'\b(\d{' + str(otp_length) + r'})\b',  # Exact digit length
-            r'code[:\s]+(\d{4,8})',  # "code: 123456"
-            r'OTP[:\s]+(\d{4,8})',  # "OTP: 123456"
-            r'verification code[:\s]+(\d{4,8})',  # "verification code: 123456"
-            r'código[:\s]+(\d{4,8})',  # Spanish
-            r'kode[:\s]+(\d{4,8})',  # Indonesian
-            r':\s*(\d{4,8})\s*',  # Any number after colon
-        ]
+        return extract_otp(text, otp_length)
+    
+    def find_otp(self, msg: Dict, full_msg: Dict, otp_length: int = 6) -> Optional[str]:
+        """Look for an OTP in the subject, then the text body, then the HTML body"""
+        return find_otp(msg, full_msg, otp_length)
+    
+    def read_failed(self, msg_id, error: Exception, seen: Set) -> bool:
+        """Record a failed read of `msg_id`; True if it was given up and added to `seen`
+        
+        A 4xx other than 429 (e.g. a deleted message) is given up at once, other
+        errors after MAX_READ_FAILURES polls, so one unreadable message cannot
+        hold back newer ones for good. Running out of deadline doesn't count.
+        """
+        cause = getattr(error, 'error', error)
+        if isinstance(cause, DeadlineExceeded):
+            return False
+        status = status_of(cause)
+        failures = self.read_failures.get(msg_id, 0) + 1
+        if (status is not None and 400 <= status < 500 and status != 429) or failures >= MAX_READ_FAILURES:
+            self.read_failures.pop(msg_id, None)
+            seen.add(msg_id)
+            return True
+        self.read_failures[msg_id] = failures
+        return False
+    
+    def poll_otp(self, checked_messages: set, otp_length: int = 6,
+                 deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Check the inbox once; messages read are added to `checked_messages`
         
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
+        Returns the OTP of the oldest new message that contains one. A message
+        that fails to read is retried on the next poll (see read_failed());
+        newer messages are still searched meanwhile but only marked checked
+        once every older one is, so the new_messages() early stop stays exact.
+        """
+        messages = self.new_messages(checked_messages, deadline)
+        blocked = False  # An older message is waiting for a retry
+        
+        for msg in messages:
+            msg_id = msg.get('id')
+            
+            # Skip if already checked
+            if msg_id in checked_messages:
+                continue
+            
+            try:
+                full_msg = self.get_message_content(msg_id, deadline)
+            except ProviderError as e:
+                # Already reported through hooks by the provider
+                if not self.read_failed(msg_id, e, checked_messages):
+                    blocked = True
+                continue
+            self.read_failures.pop(msg_id, None)
+            if not blocked:
+                checked_messages.add(msg_id)
+            
+            if full_msg:
+                otp = self.find_otp(msg, full_msg, otp_length)
+                if otp or not blocked:
+                    self.hooks.on_message(self.email, msg, otp)
+                if otp:
+                    self.hooks.on_otp(self.email, otp)
+                    return otp
         
         return None
     
@@ -349,70 +635,40 @@ class TempMailGenerator:
         if not self.email:
             raise Exception("Email belum di-generate")
         
-        print(f"⏳ Menunggu OTP di {self.email}...")
-        print(f"   Timeout: {timeout} detik, Check interval: {check_interval} detik")
+        self.hooks.on_wait(self.email, timeout, check_interval)
         
         start_time = time.time()
+        deadline = Deadline(timeout)  # Requests never run past the wait timeout
         checked_messages = set()
         
         while time.time() - start_time < timeout:
-            messages = self.check_inbox()
-            
-            for msg in messages:
-                msg_id = msg.get('id')
-                
-                # Skip if already checked
-                if msg_id in checked_messages:
-                    continue
-                
-                checked_messages.add(msg_id)
-                
-                # Get full message content
-                full_msg = self.get_message_content(msg_id)
-                
-                if full_msg:
-                    print(f"\n📧 Pesan baru dari: {msg.get('from', 'Unknown')}")
-                    print(f"   Subject: {msg.get('subject', 'No subject')}")
-                    print(f"   Time: {msg.get('date', 'Unknown')}")
-                    
-                    # Try to extract OTP from subject
-                    subject = msg.get('subject', '')
-                    otp = self.extract_otp(subject, otp_length)
-                    
-                    # If not found in subject, check body
-                    if not otp:
-                        body = full_msg.get('body', '')
-                        otp = self.extract_otp(body, otp_length)
-                    
-                    # If not found in text body, check HTML body
-                    if not otp:
-                        html_body = full_msg.get('htmlBody', '')
-                        # Remove HTML tags
-                        clean_text = re.sub('<.*?>', ' ', html_body)
-                        otp = self.extract_otp(clean_text, otp_length)
-                    
-                    if otp:
-                        print(f"\n🎉 OTP ditemukan: {otp}")
-                        return otp
-                    else:
-                        print("   ⚠️ OTP tidak ditemukan dalam pesan ini")
+            try:
+                otp = self.poll_otp(checked_messages, otp_length, deadline)
+            except Exception:
+                otp = None  # Provider error, already reported through hooks; keep polling
+            if otp:
+                return otp
             
             # Wait before next check
             time.sleep(check_interval)
-            elapsed = int(time.time() - start_time)
-            print(f"   Checking... ({elapsed}/{timeout} detik)", end='\r')
+            self.hooks.on_poll(self.email, time.time() - start_time, timeout)
         
-        print(f"\n⏱️ Timeout! Tidak ada OTP dalam {timeout} detik")
+        self.hooks.on_timeout(self.email, timeout)
         return None
     
     def get_all_messages_details(self) -> List[Dict]:
-        """Get all messages with full details"""
-        messages = self.check_inbox()
+        """Get all messages with full details (every page)"""
+        if not self.generator:
+            raise Exception("Email belum di-generate")
+        messages = list(self.generator.iter_messages())
         detailed_messages = []
         
         for msg in messages:
             msg_id = msg.get('id')
-            full_msg = self.get_message_content(msg_id)
+            try:
+                full_msg = self.get_message_content(msg_id)
+            except Exception:
+                continue  # Skip unreadable messages, already reported through hooks
             if full_msg:
                 detailed_messages.append({
                     'from': msg.get('from'),
@@ -425,6 +681,75 @@ class TempMailGenerator:
         return detailed_messages
 
 
+def iter_otps(
+    generators: Iterable[TempMailGenerator],
+    timeout: float = 120,
+    check_interval: float = 5,
+    otp_length: int = 6,
+    max_concurrent: int = 10,
+    requests_per_second: Optional[float] = None
+) -> Iterator[Tuple[TempMailGenerator, Optional[str]]]:
+    """Watch many inboxes from one poll loop, yield (generator, otp) as each OTP lands
+    
+    All inboxes share one request budget: at most `max_concurrent` polls in
+    flight and, if set, `requests_per_second` provider requests (inbox
+    listings, message reads and retries alike). Inboxes still without an OTP
+    after `timeout` seconds are yielded last with otp None.
+    """
+    generators = list(generators)
+    if any(not gen.email for gen in generators):
+        raise Exception("Email belum di-generate")
+    
+    budget = SharedTokenBucket(requests_per_second, max(1.0, requests_per_second)) if requests_per_second else None
+    previous = [gen.budget for gen in generators]
+    for gen in generators:
+        gen.share_budget(budget)
+    
+    deadline = Deadline(timeout)  # Also bounds each request's timeout
+    checked = [set() for _ in generators]
+    waiting = set(range(len(generators)))
+    
+    try:
+        with PollScheduler(max_concurrent, thread_name_prefix='wait-otp') as scheduler:
+            for index, gen in enumerate(generators):
+                scheduler.schedule(index, gen.poll_otp, checked[index], otp_length, deadline)
+            
+            for index, future in scheduler.completed(until=deadline.expires_at):
+                # Poll errors are retried on the next tick
+                otp = None if future.exception() is not None else future.result()
+                if otp:
+                    waiting.discard(index)
+                    yield generators[index], otp
+                else:
+                    scheduler.schedule(
+                        index, generators[index].poll_otp, checked[index], otp_length, deadline,
+                        at=time.monotonic() + check_interval
+                    )
+        
+        for index in sorted(waiting):
+            yield generators[index], None
+    finally:
+        for gen, budget in zip(generators, previous):
+            gen.share_budget(budget)
+
+
+def wait_any(
+    generators: Iterable[TempMailGenerator], timeout: float = 120, **kwargs
+) -> Optional[Tuple[TempMailGenerator, str]]:
+    """First (generator, otp) to arrive across all inboxes, or None after `timeout`"""
+    for generator, otp in iter_otps(generators, timeout, **kwargs):
+        return (generator, otp) if otp else None
+    return None
+
+
+def wait_all(
+    generators: Iterable[TempMailGenerator], timeout: float = 120, **kwargs
+) -> List[Optional[str]]:
+    """OTP of every inbox (None where it timed out), in the order given"""
+    generators = list(generators)
+    otps = {id(generator): otp for generator, otp in iter_otps(generators, timeout, **kwargs)}
+    return [otps.get(id(generator)) for generator in generators]
+
 
 def main():
     """Main function untuk demo"""
@@ -433,7 +758,7 @@ def main():
     print("=" * 60)
     
     # Initialize generator
-    generator = TempMailGenerator()
+    generator = TempMailGenerator(hooks=ConsoleReporter())
     
     # Generate new email
     email = generator.generate_random_email()
@@ -484,7 +809,10 @@ def main():
             
         elif choice == "2":
             print("\n📬 Checking inbox...")
-            messages = generator.check_inbox()
+            try:
+                messages = generator.check_inbox()
+            except Exception:
+                continue  # Error already printed by ConsoleReporter
             if messages:
                 print(f"📨 Ditemukan {len(messages)} pesan:")
                 for msg in messages:
@@ -503,7 +831,10 @@ def main():
                 
         elif choice == "4":
             print("\n📚 Mendapatkan detail semua pesan...")
-            messages = generator.get_all_messages_details()
+            try:
+                messages = generator.get_all_messages_details()
+            except Exception:
+                continue  # Error already printed by ConsoleReporter
             if messages:
                 for i, msg in enumerate(messages, 1):
                     print(f"\n--- Pesan {i} ---")
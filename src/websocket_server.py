@@ -5,18 +5,26 @@ Connects Telegram Bot with Browser Extension
 """
 
 import asyncio
-import json
 import time
 import logging
 import os
-from typing import Dict, Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
 # FastAPI and WebSocket
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel, Field, validator
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, validator
+
+import json_codec
+from admission import AdmissionController
+from backplane import create_backplane
+from dashboard_metrics import DashboardMetrics
+from event_log import EventLog
+from health import LoopLagMonitor, ProviderHealth
+from otp_queue import PendingOTPQueue
+from ws_connection import CRITICAL_TYPES, ClientConnection, StreamSubscriber, Subscriber
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +34,48 @@ logger = logging.getLogger(__name__)
 SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
 SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
 WEBSOCKET_URL = os.getenv('WEBSOCKET_URL', f'ws://localhost:{SERVER_PORT}')
+TELEGRAM_BOT_MODE = os.getenv('TELEGRAM_BOT_MODE', 'polling').lower()
+MAX_PENDING_OTPS = int(os.getenv('MAX_PENDING_OTPS', '10'))  # per user
+PENDING_OTP_TTL = int(os.getenv('PENDING_OTP_TTL', '600'))  # seconds
+REAP_INTERVAL = 30  # seconds between expired OTP sweeps
+REPLAY_LOG_SIZE = int(os.getenv('REPLAY_LOG_SIZE', '50'))  # events kept per user for ?since= resume
+REPLAY_LOG_TTL = int(os.getenv('REPLAY_LOG_TTL', '3600'))  # seconds
+MAX_CONNECTIONS_PER_USER = int(os.getenv('MAX_CONNECTIONS_PER_USER', '5'))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '1'))  # >1 shares state over the Unix socket backplane
+
+# Heartbeat: ping connections idle for HEARTBEAT_INTERVAL, close after HEARTBEAT_DEAD_TIMEOUT
+HEARTBEAT_INTERVAL = int(os.getenv('HEARTBEAT_INTERVAL', '30'))
+HEARTBEAT_DEAD_TIMEOUT = int(os.getenv('HEARTBEAT_DEAD_TIMEOUT', '90'))
+HEARTBEAT_SWEEP_INTERVAL = 5  # seconds between sweeps
+HEARTBEAT_BATCH_SIZE = 500  # connections handled per loop iteration
+PING_FRAME = json_codec.dumps({"type": "ping"})
+
+# HTTP fallbacks for clients without WebSocket
+SSE_KEEPALIVE = 15  # seconds between SSE keepalive comments
+SSE_RETRY_MS = 3000  # client reconnect delay hint
+LONG_POLL_MAX_TIMEOUT = 60  # seconds
+
+# Batch ingestion limits
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '1000'))
+MAX_INGEST_LINES = int(os.getenv('MAX_INGEST_LINES', '100000'))
+INGEST_CHUNK_SIZE = 500  # NDJSON lines dispatched together
+
+# Dashboard: snapshots pushed per second at most, small queue per viewer
+DASHBOARD_MAX_RATE = float(os.getenv('DASHBOARD_MAX_RATE', '2'))
+DASHBOARD_QUEUE_SIZE = 4
+PONG_FRAME = json_codec.dumps({"type": "pong"})
+
+# Admission control: token buckets per user_id and per client IP, global caps
+RATE_LIMIT_USER = float(os.getenv('RATE_LIMIT_USER', '2'))  # events/connects per second
+RATE_LIMIT_USER_BURST = float(os.getenv('RATE_LIMIT_USER_BURST', '20'))
+RATE_LIMIT_IP = float(os.getenv('RATE_LIMIT_IP', '50'))  # requests (or batch items) per second
+RATE_LIMIT_IP_BURST = float(os.getenv('RATE_LIMIT_IP_BURST', '1000'))
+MAX_CONNECTIONS = int(os.getenv('MAX_CONNECTIONS', '10000'))  # per worker, 0 = unlimited
+MEMORY_LIMIT_MB = float(os.getenv('MEMORY_LIMIT_MB', '0'))  # shed load above this RSS, 0 = off
+SHED_REASONS = ('memory', 'connection_cap', 'draining')  # answered with 503, rate limits with 429
+
+# Readiness fails when the event loop lags more than this (seconds)
+READY_MAX_LOOP_LAG = float(os.getenv('READY_MAX_LOOP_LAG', '1.0'))
 
 # CORS configuration - defaults to localhost only for security
 ALLOWED_ORIGINS = os.getenv('ALLOWED_ORIGINS', 'http://localhost:3000,http://localhost:8000,http://127.0.0.1:8000').split(',')
@@ -44,56 +94,346 @@ app.add_middleware(
 # Store active connections and pending OTPs
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.pending_otps: Dict[str, Dict] = {}
+        # user_id -> every open connection of that user (one per browser)
+        self.active_connections: Dict[str, Set[Subscriber]] = {}
+        self.connection_count = 0
+        self.stream_count = 0  # SSE streams and long-polls (not in connection_count)
+        self.sockets: Dict[str, int] = {}  # user_id -> counted (WebSocket) connections
+        self.pending_otps = PendingOTPQueue(max_per_user=MAX_PENDING_OTPS, ttl=PENDING_OTP_TTL)
         self.user_emails: Dict[str, str] = {}  # user_id -> current_email
+        self.events = EventLog(max_per_user=REPLAY_LOG_SIZE, ttl=REPLAY_LOG_TTL)
+        self.metrics = DashboardMetrics()
+        self.dashboard_viewers: Set[ClientConnection] = set()
+        # Replicates events and acks to the other workers (no-op with one worker)
+        self.backplane = create_backplane()
+        self.tasks: List[asyncio.Task] = []
+        self._spawned: Set[asyncio.Task] = set()  # fire-and-forget tasks, kept until done
         
-    async def connect(self, websocket: WebSocket, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str, since: Optional[int] = None) -> ClientConnection:
         """Accept new WebSocket connection"""
         await websocket.accept()
-        self.active_connections[user_id] = websocket
-        logger.info(f"✅ User {user_id} connected")
+        connection = ClientConnection(websocket, user_id, on_close=self._connection_closed)
+        connection.start()
+        self.attach(connection, since)
+        return connection
+    
+    def attach(self, subscriber: Subscriber, since: Optional[int] = None):
+        """Register a subscriber for its user's events and send what it missed
+        
+        `since` is the last event seq the client has seen; it acts as an ack
+        and the client receives exactly the events it missed after it.
+        """
+        user_id = subscriber.user_id
+        connections = self.active_connections.setdefault(user_id, set())
+        connections.add(subscriber)
+        if subscriber.counted:
+            self.connection_count += 1
+            self.sockets[user_id] = self.sockets.get(user_id, 0) + 1
+        else:
+            self.stream_count += 1
+        logger.info(f"✅ User {user_id} connected ({len(connections)} connections)")
+        
+        # Limit connections per user: close the oldest of the same kind,
+        # so an SSE stream or long-poll never evicts the extension's WebSocket
+        same_kind = [conn for conn in connections if conn.counted == subscriber.counted]
+        excess = len(same_kind) - MAX_CONNECTIONS_PER_USER
+        for oldest in sorted(same_kind, key=lambda conn: conn.connected_at)[:max(0, excess)]:
+            self.disconnect(user_id, oldest)
+            self.spawn(oldest.close(code=1008))
+        
+        if since is not None:
+            events, truncated = self.catch_up(user_id, since)
+            if truncated:
+                # Older missed events were evicted; client should refresh its state
+                subscriber.send({"type": "resync", "since": since})
+        else:
+            # Retransmit unacked OTPs
+            events = self.pending_otps.pending(user_id)
+        
+        for event in events:
+            if not subscriber.send(event):
+                break
+    
+    def catch_up(self, user_id: str, since: int) -> Tuple[List[dict], bool]:
+        """Ack everything up to `since`, return missed events and whether some were evicted"""
+        self.ack(user_id, since)
+        events, truncated = self.events.since(user_id, since)
+        
+        # Unacked OTPs survive even if the replay log already dropped them
+        replayed = {event["seq"] for event in events}
+        events += [item for item in self.pending_otps.pending(user_id) if item["seq"] not in replayed]
+        events.sort(key=lambda event: event["seq"])
+        return events, truncated
+    
+    async def publish(self, user_id: str, data: dict, reliable: bool = False) -> Tuple[dict, bool]:
+        """Record a per-user event in the replay log and deliver it
+        
+        `reliable` events (OTPs) also stay in the pending queue until acked.
+        Every worker records the event; the one(s) holding the user's
+        connections deliver it. Returns the event (with seq) and whether a
+        connection on any worker received it.
+        """
+        message, delivered = await self.backplane.publish({
+            "op": "event",
+            "user_id": user_id,
+            "event": dict(data),
+            "reliable": reliable
+        })
+        return message["event"], delivered
+    
+    def stamp(self, message: dict):
+        """Backplane sequencer: one worker assigns every event seq, so they increase cluster-wide"""
+        if message["op"] == "event":
+            message["event"]["seq"] = self.events.next_seq()
+    
+    async def apply(self, message: dict):
+        """Backplane handler: apply an operation published by any worker"""
+        user_id = message["user_id"]
+        
+        if message["op"] == "event":
+            event = self.events.append(user_id, message["event"])
+            if event.get("type") == "new_email":
+                self.user_emails[user_id] = event["email"]
+            if message.get("reliable"):
+                self.pending_otps.push(user_id, event)
+            return await self.send_otp(user_id, event)
         
-        # Send any pending OTP
-        if user_id in self.pending_otps:
-            await self.send_otp(user_id, self.pending_otps.pop(user_id))
+        if message["op"] == "ack":
+            self.pending_otps.ack(user_id, message["seq"])
+        if message["op"] == "connections":
+            return self.sockets.get(user_id, 0)
+        return False
     
-    def disconnect(self, user_id: str):
-        """Remove WebSocket connection"""
-        if user_id in self.active_connections:
+    def _connection_closed(self, connection: Subscriber):
+        self.disconnect(connection.user_id, connection)
+    
+    def disconnect(self, user_id: str, connection: Subscriber):
+        """Remove one WebSocket connection of a user"""
+        connections = self.active_connections.get(user_id)
+        if not connections or connection not in connections:
+            return
+        
+        connections.discard(connection)
+        if connection.counted:
+            self.connection_count -= 1
+            self.sockets[user_id] -= 1
+            if not self.sockets[user_id]:
+                del self.sockets[user_id]
+        else:
+            self.stream_count -= 1
+        if not connections:
             del self.active_connections[user_id]
-            logger.info(f"❌ User {user_id} disconnected")
+        logger.info(f"❌ User {user_id} disconnected ({len(connections)} left)")
+    
+    @property
+    def open_connections(self) -> int:
+        """Every long-lived subscriber held here, as counted against MAX_CONNECTIONS"""
+        return self.connection_count + self.stream_count + len(self.dashboard_viewers)
+    
+    def is_connected(self, user_id: str) -> bool:
+        """Has a WebSocket here (HTTP waiters don't count)"""
+        return user_id in self.sockets
+    
+    async def remote_connections(self, user_id: str) -> int:
+        """WebSocket connections of the user held by the other workers"""
+        counts = await self.backplane.gather({"op": "connections", "user_id": user_id})
+        return sum(count for count in counts if isinstance(count, int))
+    
+    def fanout(self, user_id: str, data) -> int:
+        """Queue a payload on every connection of a user, returns connections reached"""
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return 0
+        
+        # Encode once, each connection's writer delivers concurrently
+        critical = False
+        if not isinstance(data, str):
+            critical = data.get("type") in CRITICAL_TYPES
+            data = json_codec.dumps(data)
+        
+        sent = 0
+        for connection in list(connections):
+            if connection.send(data, critical):
+                sent += 1
+        return sent
     
     async def send_otp(self, user_id: str, data: dict):
-        """Send OTP to connected user"""
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            try:
-                await websocket.send_json(data)
+        """Queue OTP for every connection of the user"""
+        if self.fanout(user_id, data):
+            if data.get("type") == "otp":
                 # Mask OTP in logs for security
                 logger.info(f"📤 OTP sent to user {user_id}")
-                return True
-            except:
-                self.disconnect(user_id)
-                return False
+                self.metrics.record_delivery(user_id, data.get("sender", ""), data.get("domain", ""))
+            return True
         return False
     
+    def ack(self, user_id: str, seq: int):
+        """Extension confirmed delivery up to `seq`"""
+        now = time.time()
+        removed = self.pending_otps.ack(user_id, seq)
+        for item in removed:
+            self.metrics.record_latency(now - item.get("timestamp", now))
+        
+        if removed:
+            # Other workers hold a copy of the pending queue (the sequencer keeps it after the event)
+            self.spawn(self.backplane.forward({"op": "ack", "user_id": user_id, "seq": seq}))
+    
+    def spawn(self, coro):
+        """Run `coro` in the background, holding a reference so it isn't collected mid-way"""
+        task = asyncio.create_task(coro)
+        self._spawned.add(task)
+        task.add_done_callback(self._spawned.discard)
+    
+    def dashboard_snapshot(self) -> dict:
+        return self.metrics.snapshot(
+            connected_users=len(self.sockets),
+            connections=self.connection_count,
+            pending_otps=len(self.pending_otps)
+        )
+    
+    async def dashboard_publisher(self):
+        """Background task: push at most DASHBOARD_MAX_RATE snapshots/s to dashboards"""
+        interval = 1 / DASHBOARD_MAX_RATE
+        while True:
+            await asyncio.sleep(interval)
+            self.metrics.sample_connections(self.connection_count)
+            if not self.dashboard_viewers:
+                continue
+            
+            # One snapshot, encoded once, shared by every viewer
+            frame = json_codec.dumps(self.dashboard_snapshot())
+            for viewer in list(self.dashboard_viewers):
+                viewer.send(frame)
+    
+    def broadcast(self, data: dict) -> int:
+        """Send one payload to every connection, serialized once"""
+        frame = json_codec.dumps(data)
+        sent = 0
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections):
+                if connection.send(frame):
+                    sent += 1
+        return sent
+    
     async def broadcast_status(self):
         """Broadcast server status to all connections"""
         status = {
             "type": "status",
-            "connected_users": len(self.active_connections),
+            "connected_users": len(self.sockets),
             "pending_otps": len(self.pending_otps),
             "timestamp": datetime.now().isoformat()
         }
         
-        for user_id, websocket in list(self.active_connections.items()):
-            try:
-                await websocket.send_json(status)
-            except:
-                self.disconnect(user_id)
+        self.broadcast(status)
+    
+    async def drain(self, timeout: float):
+        """Shutdown: refuse new work and wait until every send queue is empty"""
+        admission.draining = True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not any(conn.queue_depth for conns in self.active_connections.values() for conn in conns):
+                break
+            await asyncio.sleep(0.1)
+        logger.info(f"🚰 Drained, closing {self.open_connections} connections")
+    
+    def queue_depths(self) -> Dict[str, List[int]]:
+        """Outbound queue depth of every connection, per user"""
+        return {
+            user_id: [conn.queue_depth for conn in connections]
+            for user_id, connections in self.active_connections.items()
+        }
+
+    async def reap_pending(self):
+        """Background task: purge expired pending OTPs and idle replay logs"""
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            expired = self.pending_otps.reap()
+            if expired:
+                logger.info(f"🧹 Purged {expired} expired pending OTPs")
+            self.events.reap()
+            admission.prune()
+
+    async def heartbeat_sweeper(self):
+        """Background task: ping idle connections and close dead ones
+        
+        One timer for the whole server instead of one per socket. Connections
+        are visited in batches, yielding to the loop between batches.
+        """
+        while True:
+            await asyncio.sleep(HEARTBEAT_SWEEP_INTERVAL)
+            now = time.monotonic()
+            pinged = closed = 0
+            
+            connections = [conn for conns in self.active_connections.values() for conn in conns]
+            for start in range(0, len(connections), HEARTBEAT_BATCH_SIZE):
+                for connection in connections[start:start + HEARTBEAT_BATCH_SIZE]:
+                    if not connection.heartbeat:
+                        continue
+                    idle = now - connection.last_seen
+                    if idle >= HEARTBEAT_DEAD_TIMEOUT:
+                        self.disconnect(connection.user_id, connection)
+                        self.spawn(connection.close(code=1001))
+                        closed += 1
+                    elif idle >= HEARTBEAT_INTERVAL and now - connection.last_ping >= HEARTBEAT_INTERVAL:
+                        connection.last_ping = now
+                        connection.send(PING_FRAME)
+                        pinged += 1
+                await asyncio.sleep(0)
+            
+            if closed:
+                logger.info(f"💔 Heartbeat: closed {closed} dead connections, pinged {pinged}")
 
 manager = ConnectionManager()
+loop_lag = LoopLagMonitor()
+providers = ProviderHealth()
+admission = AdmissionController(
+    user_rate=RATE_LIMIT_USER,
+    user_burst=RATE_LIMIT_USER_BURST,
+    ip_rate=RATE_LIMIT_IP,
+    ip_burst=RATE_LIMIT_IP_BURST,
+    max_connections=MAX_CONNECTIONS,
+    memory_limit_mb=MEMORY_LIMIT_MB
+)
+
+# Set by the supervisor when it runs this app on its loop
+service_health: Optional[Callable[[], dict]] = None
+SUPERVISOR_HEALTH_FILE = os.getenv('SUPERVISOR_HEALTH_FILE', '')
+
+def client_ip(connection) -> str:
+    """Source IP of a Request or WebSocket"""
+    return connection.client.host if connection.client else "unknown"
+
+def raise_if_rejected(rejection: Optional[Tuple[str, float]]):
+    """Turn an admission rejection into 503 (overload) or 429 (rate limit)"""
+    if rejection is None:
+        return
+    reason, retry_after = rejection
+    raise HTTPException(
+        status_code=503 if reason in SHED_REASONS else 429,
+        detail=f"Rejected: {reason}",
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+    )
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start backplane, pending OTP reaper, heartbeat sweeper and dashboard publisher"""
+    admission.draining = False
+    await manager.backplane.start(manager.apply, manager.stamp)
+    manager.tasks = [
+        asyncio.create_task(manager.reap_pending()),
+        asyncio.create_task(manager.heartbeat_sweeper()),
+        asyncio.create_task(manager.dashboard_publisher()),
+        asyncio.create_task(loop_lag.run()),
+        asyncio.create_task(providers.run())
+    ]
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """Stop background tasks (the supervisor may start the app again on the same loop)"""
+    for task in manager.tasks:
+        task.cancel()
+    manager.tasks = []
+    await manager.backplane.stop()
 
 # Data models
 class OTPData(BaseModel):
@@ -126,10 +466,41 @@ async def root():
     return {
         "status": "running",
         "service": "TempMail OTP Auto-Fill Server",
-        "connected_users": len(manager.active_connections),
-        "pending_otps": len(manager.pending_otps)
+        "connected_users": len(manager.sockets),
+        "connections": manager.connection_count,
+        "pending_otps": len(manager.pending_otps),
+        "rejections": dict(admission.rejections)
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness: answering at all means the event loop is running"""
+    return {"status": "alive", "loop_lag": loop_lag.stats()}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: loop responsive, a mail provider reachable, supervised services up"""
+    services = service_health()["services"] if service_health else {}
+    checks = {
+        "accepting": not admission.draining,
+        "loop_lag": loop_lag.current <= READY_MAX_LOOP_LAG,
+        # Unknown until the first probe finishes: don't fail on startup
+        "providers": providers.any_up() is not False,
+        "services": all(service["state"] == "running" for service in services.values())
+    }
+    ready = all(checks.values())
+    
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "status": "ready" if ready else "not_ready",
+        "checks": checks,
+        "loop_lag": loop_lag.stats(),
+        "providers": providers.results,
+        "services": services,
+        "connected_users": len(manager.sockets),
+        "connections": manager.connection_count,
+        "pending_otps": len(manager.pending_otps)
+    })
+
 @app.get("/dashboard")
 async def dashboard():
     """Simple dashboard HTML"""
@@ -170,6 +541,21 @@ async def dashboard():
                 </div>
             </div>
             
+            <div class="stats">
+                <div class="stat-card">
+                    <div class="stat-value" id="rate">0</div>
+                    <div class="stat-label">OTPs / Last Minute</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value" id="p50">0</div>
+                    <div class="stat-label">Ack Latency p50 (ms)</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value" id="p95">0</div>
+                    <div class="stat-label">Ack Latency p95 (ms)</div>
+                </div>
+            </div>
+            
             <h3>📊 Live Activity</h3>
             <div id="log"></div>
         </div>
@@ -179,79 +565,116 @@ async def dashboard():
                 'wss://' + window.location.host + '/ws/dashboard' : 
                 'ws://' + window.location.host + '/ws/dashboard';
             const ws = new WebSocket(wsUrl);
-            let delivered = 0;
+            let lastEventId = 0;
             
+            // Server pushes throttled snapshots; nothing to poll
             ws.onmessage = (event) => {
                 const data = JSON.parse(event.data);
+                if (data.type !== 'snapshot') return;
                 
-                if (data.type === 'status') {
-                    document.getElementById('connected').textContent = data.connected_users;
-                    document.getElementById('pending').textContent = data.pending_otps;
-                }
+                document.getElementById('connected').textContent = data.connected_users;
+                document.getElementById('pending').textContent = data.pending_otps;
+                document.getElementById('delivered').textContent = data.delivered_today;
+                document.getElementById('rate').textContent =
+                    data.deliveries_per_sec.reduce((a, b) => a + b, 0);
+                document.getElementById('p50').textContent = data.latency_ms.p50;
+                document.getElementById('p95').textContent = data.latency_ms.p95;
                 
-                if (data.type === 'otp_delivered') {
-                    delivered++;
-                    document.getElementById('delivered').textContent = delivered;
+                const log = document.getElementById('log');
+                for (const item of data.events) {
+                    if (item.id <= lastEventId) continue;
+                    lastEventId = item.id;
                     
-                    const log = document.getElementById('log');
                     const entry = document.createElement('div');
                     entry.className = 'log-entry';
-                    entry.innerHTML = `🔑 OTP delivered to ${data.user_id}: ${data.otp}`;
+                    const time = new Date(item.timestamp * 1000).toLocaleTimeString();
+                    entry.textContent = `🔑 ${time} OTP delivered to ${item.user_id}` +
+                        (item.domain ? ` (${item.domain})` : '');
                     log.insertBefore(entry, log.firstChild);
                 }
+                while (log.childNodes.length > 100) log.removeChild(log.lastChild);
             };
-            
-            // Update every 5 seconds
-            setInterval(() => {
-                if (ws.readyState === WebSocket.OPEN) {
-                    ws.send(JSON.stringify({action: 'status'}));
-                }
-            }, 5000);
         </script>
     </body>
     </html>
     """
     return HTMLResponse(content=html)
 
+@app.websocket("/ws/dashboard")
+async def dashboard_endpoint(websocket: WebSocket):
+    """Dashboard channel: receives throttled server-side snapshots"""
+    if admission.check_connection(client_ip(websocket), "dashboard", manager.open_connections):
+        await websocket.close(code=1013)
+        return
+    
+    await websocket.accept()
+    viewer = ClientConnection(websocket, "dashboard", queue_size=DASHBOARD_QUEUE_SIZE, policy='drop_oldest')
+    viewer.start()
+    manager.dashboard_viewers.add(viewer)
+    viewer.send(manager.dashboard_snapshot())
+    
+    try:
+        while True:
+            await websocket.receive_text()  # Viewers don't send anything we need
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.debug(f"Dashboard viewer error: {e}")
+    finally:
+        manager.dashboard_viewers.discard(viewer)
+        await viewer.close()
+
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    """WebSocket endpoint for browser extensions"""
-    await manager.connect(websocket, user_id)
+async def websocket_endpoint(websocket: WebSocket, user_id: str, since: Optional[int] = None):
+    """WebSocket endpoint for browser extensions (?since=<seq> resumes missed events)"""
+    rejection = admission.check_connection(client_ip(websocket), user_id, manager.open_connections)
+    if rejection:
+        # Close before accept: the handshake fails fast, 1013 = try again later
+        await websocket.close(code=1013)
+        return
+    
+    connection = await manager.connect(websocket, user_id, since)
     
     try:
         while True:
-            # Keep connection alive and handle messages
-            try:
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=30)
-                message = json.loads(data)
-                
-                # Handle ping/pong
-                if message.get("type") == "ping":
-                    await websocket.send_json({"type": "pong"})
-                
-                # Handle status request
-                elif message.get("type") == "status":
-                    status = {
-                        "type": "status",
-                        "connected": True,
-                        "email": manager.user_emails.get(user_id),
-                        "timestamp": time.time()
-                    }
-                    await websocket.send_json(status)
-                    
-            except asyncio.TimeoutError:
-                # Send ping to keep connection alive
-                await websocket.send_json({"type": "ping"})
+            # Handle messages (keepalive is done by the heartbeat sweeper)
+            data = await websocket.receive_text()
+            connection.touch()
+            message = json_codec.loads(data)
+            
+            # Handle ping/pong
+            if message.get("type") == "ping":
+                connection.send(PONG_FRAME)
+            
+            # Handle OTP delivery ack (cumulative)
+            elif message.get("type") == "ack":
+                try:
+                    manager.ack(user_id, int(message.get("seq")))
+                except (TypeError, ValueError):
+                    pass
+            
+            # Handle status request
+            elif message.get("type") == "status":
+                status = {
+                    "type": "status",
+                    "connected": True,
+                    "email": manager.user_emails.get(user_id),
+                    "timestamp": time.time()
+                }
+                connection.send(status)
                 
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        manager.disconnect(user_id, connection)
     except Exception as e:
         logger.error(f"WebSocket error for {user_id}: {e}")
-        manager.disconnect(user_id)
+        manager.disconnect(user_id, connection)
+    finally:
+        await connection.close()
 
-@app.post("/api/otp")
-async def receive_otp(data: OTPData):
-    """Receive OTP from Telegram bot"""
+async def deliver_otp(data: OTPData) -> dict:
+    """Queue an OTP for the user and try to deliver it now"""
+    raise_if_rejected(admission.check_user(data.user_id))
+    
     otp_info = {
         "type": "otp",
         "otp": data.otp,
@@ -261,40 +684,274 @@ async def receive_otp(data: OTPData):
         "timestamp": time.time()
     }
     
-    # Try to send immediately
-    if await manager.send_otp(data.user_id, otp_info):
+    # Logged for replay and queued until acked, so it survives reconnects
+    otp_info, delivered = await manager.publish(data.user_id, otp_info, reliable=True)
+    
+    if delivered:
         logger.info(f"✅ OTP delivered to {data.user_id}")
-        return {"status": "delivered", "user_id": data.user_id}
+        return {"status": "delivered", "user_id": data.user_id, "seq": otp_info["seq"]}
     else:
-        # Store for later
-        manager.pending_otps[data.user_id] = otp_info
         logger.info(f"📦 OTP stored for {data.user_id} (offline)")
-        return {"status": "pending", "user_id": data.user_id}
+        return {"status": "pending", "user_id": data.user_id, "seq": otp_info["seq"]}
 
-@app.post("/api/email")
-async def register_email(data: EmailData):
-    """Register new email for user"""
-    manager.user_emails[data.user_id] = data.email
+async def register(data: EmailData) -> dict:
+    """Store the user's current email and notify the extension"""
+    raise_if_rejected(admission.check_user(data.user_id))
     
-    # Notify extension
+    # Every worker stores the email when it applies the event
     email_info = {
         "type": "new_email",
         "email": data.email,
         "timestamp": time.time()
     }
     
-    await manager.send_otp(data.user_id, email_info)
-    return {"status": "registered", "email": data.email}
+    email_info, _ = await manager.publish(data.user_id, email_info)
+    return {"status": "registered", "email": data.email, "seq": email_info["seq"]}
+
+async def process_batch(items: List[dict], model, handler) -> List[dict]:
+    """Validate every item, dispatch the valid ones concurrently, report per item"""
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE})")
+    
+    results: List[Optional[dict]] = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model(**item)))
+        except (ValidationError, TypeError) as e:
+            results[index] = {"status": "invalid", "error": str(e)}
+    
+    outcomes = await asyncio.gather(
+        *(handler(data) for _, data in valid),
+        return_exceptions=True
+    )
+    for (index, _), outcome in zip(valid, outcomes):
+        if isinstance(outcome, HTTPException):
+            results[index] = {"status": "rejected", "error": outcome.detail}
+        elif isinstance(outcome, Exception):
+            results[index] = {"status": "error", "error": str(outcome)}
+        else:
+            results[index] = outcome
+    
+    for index, result in enumerate(results):
+        result["index"] = index
+    return results
+
+@app.post("/api/otp")
+async def receive_otp(data: OTPData, request: Request):
+    """Receive OTP from Telegram bot"""
+    raise_if_rejected(admission.check_request(client_ip(request)))
+    return await deliver_otp(data)
+
+@app.post("/api/otp/batch")
+async def receive_otp_batch(items: List[dict], request: Request):
+    """Receive many OTPs in one request"""
+    raise_if_rejected(admission.check_request(client_ip(request), tokens=len(items)))
+    return {"results": await process_batch(items, OTPData, deliver_otp)}
+
+@app.post("/api/email")
+async def register_email(data: EmailData, request: Request):
+    """Register new email for user"""
+    raise_if_rejected(admission.check_request(client_ip(request)))
+    return await register(data)
+
+@app.post("/api/email/batch")
+async def register_email_batch(items: List[dict], request: Request):
+    """Register many emails in one request"""
+    raise_if_rejected(admission.check_request(client_ip(request), tokens=len(items)))
+    return {"results": await process_batch(items, EmailData, register)}
+
+@app.post("/api/ingest")
+async def ingest_ndjson(request: Request):
+    """Streaming NDJSON ingest: one OTP or email event per line
+    
+    Lines with "type": "otp" (or an "otp" field) are OTPs, the rest are
+    email registrations. Lines are dispatched in chunks while the body streams.
+    Past MAX_INGEST_LINES reading stops: the first line over the limit is
+    marked rejected, earlier results are returned with "truncated": true.
+    """
+    ip = client_ip(request)
+    raise_if_rejected(admission.check_request(ip))
+    results: List[dict] = []
+    buffer = b""
+    line_no = 0
+    otp_lines: List[tuple] = []
+    email_lines: List[tuple] = []
+    
+    async def flush():
+        if not otp_lines and not email_lines:
+            return
+        # Each line is an item: charge the IP per line, like the batch endpoints
+        rejection = admission.check_request(ip, tokens=len(otp_lines) + len(email_lines))
+        if rejection:
+            for lines in (otp_lines, email_lines):
+                results.extend(
+                    {"index": number, "status": "rejected", "error": f"Rejected: {rejection[0]}"}
+                    for number, _ in lines
+                )
+                lines.clear()
+            return
+        
+        for lines, model, handler in ((otp_lines, OTPData, deliver_otp), (email_lines, EmailData, register)):
+            if not lines:
+                continue
+            batch = await process_batch([item for _, item in lines], model, handler)
+            for (number, _), result in zip(lines, batch):
+                result["index"] = number
+                results.append(result)
+            lines.clear()
+    
+    async def parse(line: bytes) -> bool:
+        """Queue one line, False once the line limit is reached"""
+        nonlocal line_no
+        line = line.strip()
+        if not line:
+            return True
+        index = line_no
+        line_no += 1
+        if line_no > MAX_INGEST_LINES:
+            # Earlier chunks are already dispatched: report, don't fail the request
+            results.append({"index": index, "status": "rejected", "error": f"Too many lines (max {MAX_INGEST_LINES})"})
+            return False
+        try:
+            item = json_codec.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("line is not a JSON object")
+        except ValueError as e:
+            results.append({"index": index, "status": "invalid", "error": str(e)})
+            return True
+        kind = item.pop("type", "otp" if "otp" in item else "email")
+        (otp_lines if kind == "otp" else email_lines).append((index, item))
+        if len(otp_lines) + len(email_lines) >= INGEST_CHUNK_SIZE:
+            await flush()
+        return True
+    
+    truncated = False
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not await parse(line):
+                truncated = True
+                break
+        if truncated:
+            break
+    if not truncated:
+        truncated = not await parse(buffer)
+    await flush()
+    
+    results.sort(key=lambda result: result["index"])
+    return {"results": results, "truncated": truncated}
 
 @app.get("/api/status/{user_id}")
 async def user_status(user_id: str):
     """Get user connection status"""
+    connections = manager.active_connections.get(user_id, set())
+    total = manager.sockets.get(user_id, 0) + await manager.remote_connections(user_id)
     return {
-        "connected": user_id in manager.active_connections,
+        "connected": total > 0,
+        "connections": total,
         "email": manager.user_emails.get(user_id),
-        "has_pending": user_id in manager.pending_otps
+        "has_pending": user_id in manager.pending_otps,
+        "queue_depth": sum(conn.queue_depth for conn in connections)  # this worker's connections
     }
 
+@app.get("/api/stream/{user_id}")
+async def stream_events(user_id: str, request: Request, since: Optional[int] = None):
+    """Server-Sent Events stream of the user's events
+    
+    Resume with ?since=<seq> or the standard Last-Event-ID header.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    raise_if_rejected(admission.check_connection(client_ip(request), user_id, manager.open_connections))
+    subscriber = StreamSubscriber(user_id, on_close=manager._connection_closed)
+    manager.attach(subscriber, since)
+    
+    async def event_source():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while not subscriber.closed:
+                frame = await subscriber.next_frame(timeout=SSE_KEEPALIVE)
+                if frame is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                
+                seq = json_codec.loads(frame).get("seq")
+                if seq:
+                    yield f"id: {seq}\ndata: {frame}\n\n"
+                else:
+                    yield f"data: {frame}\n\n"
+        finally:
+            await subscriber.close()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/wait/{user_id}")
+async def wait_for_events(user_id: str, request: Request, timeout: float = 30, since: Optional[int] = None):
+    """Long-poll: return as soon as the user has new events, or empty after `timeout`
+    
+    Pass the highest seq received as ?since= on the next call (also acks OTPs).
+    """
+    raise_if_rejected(admission.check_connection(client_ip(request), user_id, manager.open_connections))
+    timeout = max(0.0, min(timeout, LONG_POLL_MAX_TIMEOUT))
+    
+    if since is not None:
+        events, truncated = manager.catch_up(user_id, since)
+        if events or truncated:
+            return {"events": events, "resync": truncated}
+    
+    subscriber = StreamSubscriber(user_id, on_close=manager._connection_closed)
+    manager.attach(subscriber, since)
+    try:
+        frames = subscriber.drain()
+        if not frames:
+            frame = await subscriber.next_frame(timeout=timeout)
+            if frame is not None:
+                frames = [frame] + subscriber.drain()
+    finally:
+        await subscriber.close()
+    
+    return {"events": [json_codec.loads(frame) for frame in frames], "resync": False}
+
+@app.get("/api/connections")
+async def connections():
+    """Per-connection outbound queue depth"""
+    depths = manager.queue_depths()
+    return {
+        "connections": manager.connection_count,
+        "streams": manager.stream_count,
+        "max_queue_depth": max((d for user in depths.values() for d in user), default=0),
+        "queue_depths": depths,
+        "admission": admission.stats()
+    }
+
+@app.get("/api/services")
+async def services_health():
+    """Health of the services run by main.py's supervisor"""
+    if service_health is not None:
+        return service_health()
+    if SUPERVISOR_HEALTH_FILE and os.path.exists(SUPERVISOR_HEALTH_FILE):
+        with open(SUPERVISOR_HEALTH_FILE) as f:
+            return json_codec.loads(f.read())
+    raise HTTPException(status_code=404, detail="Not running under the supervisor")
+
+# Telegram webhook: in webhook mode the bot receives updates through this app
+# (single worker only, see main(); the Application is built on startup)
+if TELEGRAM_BOT_MODE == 'webhook':
+    from telegram_bot import build_application, load_bot_token
+    from telegram_webhook import WEBHOOK_CONCURRENCY, mount_webhook
+    
+    mount_webhook(app, lambda: build_application(load_bot_token(), concurrent_updates=WEBHOOK_CONCURRENCY))
+
 def main():
     """Run the server"""
     import uvicorn
@@ -303,6 +960,22 @@ def main():
     print(f"📊 Dashboard: http://localhost:{SERVER_PORT}/dashboard")
     print("-" * 50)
     
+    if SERVER_WORKERS > 1:
+        if TELEGRAM_BOT_MODE == 'webhook':
+            # Every worker would build its own bot, sessions and set_webhook
+            raise ValueError("TELEGRAM_BOT_MODE=webhook butuh SERVER_WORKERS=1")
+        # Workers are separate processes: share events through the Unix socket backplane
+        os.environ['BACKPLANE'] = 'unix'
+        print(f"👥 Workers: {SERVER_WORKERS}")
+        uvicorn.run(
+            "websocket_server:app",
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            workers=SERVER_WORKERS,
+            log_level="info"
+        )
+        return
+    
     uvicorn.run(
         app, 
         host=SERVER_HOST, 
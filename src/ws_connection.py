@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Client Connections
+Bounded outbound queue per client: WebSockets drained by a writer task,
+HTTP streams (SSE / long-poll) by the request handler
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from fastapi import WebSocket
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SEND_QUEUE_SIZE = int(os.getenv('WS_SEND_QUEUE_SIZE', '64'))
+# What to do when a client can't keep up: 'drop_oldest' or 'disconnect'
+SLOW_CONSUMER_POLICY = os.getenv('WS_SLOW_CONSUMER_POLICY', 'drop_oldest')
+# Frames drop_oldest never discards (they are only lost by disconnecting)
+CRITICAL_TYPES = {'otp', 'resync'}
+
+
+class Subscriber:
+    """A client receiving a user's events through a bounded queue
+
+    All sends go through `send()`, which never blocks the caller; a slow or
+    stalled client only fills its own queue. The queue holds
+    (frame, critical) pairs; critical frames (OTPs) are never dropped.
+    """
+
+    # Whether the heartbeat sweeper pings and times out this subscriber
+    heartbeat = True
+    # Whether it counts as a connection (per-user cap, connection count, connected status)
+    counted = True
+
+    def __init__(
+        self,
+        user_id: str,
+        on_close: Optional[Callable[['Subscriber'], None]] = None,
+        queue_size: int = SEND_QUEUE_SIZE,
+        policy: str = SLOW_CONSUMER_POLICY
+    ):
+        self.user_id = user_id
+        self.policy = policy
+        self.queue_size = queue_size
+        self.queue: deque = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at  # last message received
+        self.last_ping = 0.0  # last heartbeat ping sent
+        self._on_close = on_close
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.queue)
+
+    def touch(self) -> None:
+        """Record activity from the peer"""
+        self.last_seen = time.monotonic()
+
+    def send(self, data, critical: bool = False) -> bool:
+        """Queue a payload (dict, or an already encoded text frame)
+
+        Applies the slow-consumer policy when the queue is full. Pass a
+        pre-encoded str to share one serialization across many connections
+        (with `critical` for OTP frames; dicts are classified by type).
+        Returns False when the frame was not queued.
+        """
+        if self.closed:
+            return False
+
+        if not isinstance(data, str):
+            critical = critical or data.get('type') in CRITICAL_TYPES
+            data = json_codec.dumps(data)
+
+        if len(self.queue) >= self.queue_size:
+            if self.policy == 'disconnect':
+                logger.warning(f"⚠️ Slow consumer {self.user_id}, disconnecting")
+                asyncio.create_task(self.close(code=1008))
+                return False
+            # drop_oldest, but only frames that may be lost (new_email, status, ping)
+            if not self._drop_oldest_expendable():
+                if critical:
+                    # Queue is all OTPs: reconnecting retransmits the pending ones
+                    logger.warning(f"⚠️ Slow consumer {self.user_id}, OTP queue full, disconnecting")
+                    asyncio.create_task(self.close(code=1008))
+                    return False
+                self.dropped += 1  # Drop the new frame instead
+                return False
+
+        self.queue.append((data, critical))
+        self._ready.set()
+        return True
+
+    def _drop_oldest_expendable(self) -> bool:
+        for index, (_, critical) in enumerate(self.queue):
+            if not critical:
+                del self.queue[index]
+                self.dropped += 1
+                return True
+        return False
+
+    async def _next(self) -> Optional[str]:
+        """Next queued frame, None once closed and empty"""
+        while not self.queue:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self.queue.popleft()[0]
+
+    def _mark_closed(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self._on_close:
+            self._on_close(self)
+
+    async def close(self, code: int = 1000) -> None:
+        self._mark_closed()
+
+
+class StreamSubscriber(Subscriber):
+    """HTTP subscriber (SSE stream or long-poll waiter) parked on its queue"""
+
+    heartbeat = False
+    counted = False
+
+    async def next_frame(self, timeout: float) -> Optional[str]:
+        """Wait for the next frame; None on timeout or when closed"""
+        if self.closed:
+            return None
+        try:
+            return await asyncio.wait_for(self._next(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self) -> list:
+        """Frames already queued, without waiting"""
+        frames = [frame for frame, _ in self.queue]
+        self.queue.clear()
+        return frames
+
+    async def close(self, code: int = 1000) -> None:
+        self._mark_closed()
+        self._ready.set()  # Wake a parked waiter
+
+
+class ClientConnection(Subscriber):
+    """One accepted WebSocket with its own send queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, user_id: str, **kwargs):
+        super().__init__(user_id, **kwargs)
+        self.websocket = websocket
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the writer task"""
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                frame = await self._next()
+                if frame is None:
+                    break
+                await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Writer for {self.user_id} stopped: {e}")
+            self._mark_closed()
+
+    async def close(self, code: int = 1000) -> None:
+        """Stop the writer and close the socket"""
+        self._mark_closed()
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
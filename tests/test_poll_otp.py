@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests: TempMailGenerator.poll_otp with messages that cannot be read
+Run with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tempmail_otp import MAX_READ_FAILURES, ProviderError, TempMailGenerator
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class FakeProvider:
+    """Inbox of (id, body) newest last; `broken` maps message IDs to the HTTP status they fail with"""
+
+    def __init__(self, messages, broken=None):
+        self.messages = list(messages)
+        self.broken = dict(broken or {})
+        self.reads = []
+
+    def iter_messages(self, seen=None, deadline=None):
+        for msg_id, _ in reversed(self.messages):
+            if seen is not None and msg_id in seen:
+                return
+            yield {'id': msg_id, 'from': 'noreply@example.com', 'subject': 'Hello'}
+
+    def get_message_content(self, message_id, deadline=None):
+        self.reads.append(message_id)
+        if message_id in self.broken:
+            raise ProviderError('fake', 'get_message', HTTPStatusError(self.broken[message_id]))
+        return {'subject': 'Hello', 'body': dict(self.messages)[message_id], 'htmlBody': ''}
+
+
+def generator_for(provider: FakeProvider) -> TempMailGenerator:
+    generator = TempMailGenerator()
+    generator.generator = provider
+    generator.email = 'test@example.com'
+    return generator
+
+
+class PollOTPTest(unittest.TestCase):
+    def test_not_found_message_does_not_hide_newer_otp(self):
+        provider = FakeProvider(
+            [('m1', 'Welcome!'), ('m2', 'deleted'), ('m3', 'Your code: 482913')],
+            broken={'m2': 404},
+        )
+        generator = generator_for(provider)
+        seen = set()
+
+        self.assertEqual(generator.poll_otp(seen), '482913')
+        self.assertEqual(seen, {'m1', 'm2', 'm3'})
+
+        # The poisoned message is not read again
+        self.assertIsNone(generator.poll_otp(seen))
+        self.assertEqual(provider.reads.count('m2'), 1)
+
+    def test_failing_message_is_skipped_after_max_read_failures(self):
+        provider = FakeProvider(
+            [('m1', 'Welcome!'), ('m2', 'flaky'), ('m3', 'No code here')],
+            broken={'m2': 500},
+        )
+        generator = generator_for(provider)
+        seen = set()
+
+        for _ in range(MAX_READ_FAILURES - 1):
+            self.assertIsNone(generator.poll_otp(seen))
+            self.assertEqual(seen, {'m1'})  # m2 is retried, m3 waits for it
+
+        self.assertIsNone(generator.poll_otp(seen))
+        self.assertEqual(seen, {'m1', 'm2', 'm3'})
+
+        provider.messages.append(('m4', 'Your code: 105577'))
+        self.assertEqual(generator.poll_otp(seen), '105577')
+        self.assertEqual(provider.reads.count('m2'), MAX_READ_FAILURES)
+
+    def test_otp_behind_a_transient_failure_is_found_at_once(self):
+        provider = FakeProvider(
+            [('m1', 'flaky'), ('m2', 'Your code: 731904')],
+            broken={'m1': 503},
+        )
+        generator = generator_for(provider)
+        seen = set()
+
+        self.assertEqual(generator.poll_otp(seen), '731904')
+        self.assertEqual(seen, set())  # Both are checked again on the next poll
+
+
+if __name__ == '__main__':
+    unittest.main()